@@ -1,27 +1,264 @@
 import google.generativeai as genai
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from response_cache import ResponseCache
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FALLBACK_RESPONSE = "I'm having a little trouble connecting to my full knowledge right now, but I'm still here to listen. 💖"
+
+MODEL_NAME = 'gemini-2.5-flash'
+API_KEY_ENV = "GENAI_API_KEY"
+API_KEY_PLACEHOLDER = "your_google_gemini_api_key"
+
+# Set LUNA_FAKE_AI=1 to chat with StubBackend instead of Gemini (offline development and testing)
+FAKE_AI_ENV = "LUNA_FAKE_AI"
+FAKE_AI_DELAY_ENV = "LUNA_FAKE_AI_DELAY"
+
+# Sent once as the model's system instruction rather than with every message
+PERSONA = (
+    "You are Luna, a warm, empathetic, and knowledgeable menstrual health companion named Luna Sensai. "
+    "Your personality is like a caring and supportive friend. You use emojis 🌸💖✨😊. "
+    "You are talking to a user who needs support with their health, feelings, and well-being. "
+    "Keep your answers concise and supportive."
+)
+
+def load_api_key():
+    """Reads GENAI_API_KEY from the environment, then from .env or .env.example next to the app."""
+    if os.environ.get(API_KEY_ENV):
+        return os.environ[API_KEY_ENV]
+    for name in ('.env', '.env.example'):
+        try:
+            with open(os.path.join(SCRIPT_DIR, name), encoding='utf-8') as f:
+                for line in f:
+                    key, _, value = line.strip().partition('=')
+                    value = value.strip().strip('"\'')
+                    if key.strip() == API_KEY_ENV and value and value != API_KEY_PLACEHOLDER:
+                        return value
+        except OSError:
+            pass
+    return None
+
+# --- Chat Backends ---
+# A backend holds one multi-turn conversation. `stream(message)` yields reply text
+# chunks and `reply(message)` returns the whole reply.
+
+class GeminiBackend:
+    """Gemini chat session, configured once with the Luna persona as its system instruction."""
+    def __init__(self, api_key=None, model_name=MODEL_NAME):
+        api_key = api_key or load_api_key()
+        if not api_key:
+            print(f"No {API_KEY_ENV} found in the environment or .env; AI responses will fail.")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name, system_instruction=PERSONA)
+        self.chat = self.model.start_chat(history=[])
+
+    def stream(self, message):
+        response = self.chat.send_message(message, stream=True)
+        finished = False
+        try:
+            for chunk in response:
+                text = getattr(chunk, 'text', '')
+                if text:
+                    yield text
+            finished = True
+        except Exception:
+            # Drop the broken turn so the session history stays usable for the next message
+            self.chat.rewind()
+            raise
+        finally:
+            if not finished:
+                # Stopped early (cancel/timeout): finish the turn so the history stays consistent
+                try:
+                    response.resolve()
+                except Exception:
+                    pass
+
+    def reply(self, message):
+        return self.chat.send_message(message).text
+
+class StubBackend:
+    """
+    Offline backend for tests and development. Streams canned chunks, sleeping
+    `first_chunk_delay` before the first one and `delay` between the rest.
+    """
+    DEFAULT_CHUNKS = ["I'm ", "here ", "for ", "you ", "🌸 ", "Tell ", "me ", "more ", "about ", "how ", "you're ", "feeling."]
+
+    def __init__(self, chunks=None, delay=0.05, first_chunk_delay=None):
+        self.chunks = list(chunks or self.DEFAULT_CHUNKS)
+        self.delay = delay
+        self.first_chunk_delay = delay if first_chunk_delay is None else first_chunk_delay
+        self.history = []
+
+    def stream(self, message):
+        self.history.append(('user', message))
+        for i, text in enumerate(self.chunks):
+            time.sleep(self.first_chunk_delay if i == 0 else self.delay)
+            yield text
+        self.history.append(('model', "".join(self.chunks)))
+
+    def reply(self, message):
+        return "".join(self.stream(message))
+
+class LunaCompanion:
+    """
+    Long-lived companion session. Create it once and reuse it for every message, so the
+    client is configured a single time and the conversation carries over between turns.
+    With a `cache` (see response_cache), repeated questions are answered without the backend,
+    but only while the session has no history: a later turn's reply depends on the
+    conversation so far, so it is neither answered from nor saved to the cache.
+    """
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.turns = 0 # Messages sent to the backend so far
+        self._lock = threading.Lock() # One turn at a time on the shared chat session
+
+    def _cacheable(self):
+        return self.cache is not None and self.turns == 0
+
+    def stream(self, user_input):
+        cacheable = self._cacheable()
+        cached = self.cache.get(user_input) if cacheable else None
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        with self._lock:
+            cacheable = self._cacheable()
+            self.turns += 1
+            for text in self.backend.stream(user_input):
+                parts.append(text)
+                yield text
+        # Only complete replies are cached; a cancelled stream never gets here
+        if cacheable:
+            self.cache.put(user_input, "".join(parts))
+
+    def reply(self, user_input):
+        cacheable = self._cacheable()
+        cached = self.cache.get(user_input) if cacheable else None
+        if cached is not None:
+            return cached
+        with self._lock:
+            cacheable = self._cacheable()
+            self.turns += 1
+            response = self.backend.reply(user_input)
+        if cacheable:
+            self.cache.put(user_input, response)
+        return response
+
+def default_backend():
+    """Returns Gemini, or StubBackend when LUNA_FAKE_AI is set."""
+    if os.environ.get(FAKE_AI_ENV):
+        return StubBackend(delay=float(os.environ.get(FAKE_AI_DELAY_ENV, 0.05)))
+    return GeminiBackend()
+
+_companion = None
+_companion_lock = threading.Lock()
+
+def get_companion():
+    """Returns the process-wide LunaCompanion, creating it on first use."""
+    global _companion
+    with _companion_lock:
+        if _companion is None:
+            try:
+                cache = ResponseCache()
+            except sqlite3.Error as e:
+                print(f"Response cache unavailable: {e}")
+                cache = None
+            _companion = LunaCompanion(default_backend(), cache)
+        return _companion
+
+def set_companion(companion):
+    """Replaces the process-wide companion (e.g. with a LunaCompanion(StubBackend()) in tests)."""
+    global _companion
+    with _companion_lock:
+        _companion = companion
+
+def stream_ai_response(user_input, companion=None):
+    """Yields Luna's response to `user_input` in text chunks as the model produces them."""
+    return (companion or get_companion()).stream(user_input)
 
 def get_ai_response(user_input):
     """
     This function gets a response from the Google Gemini AI model.
     """
     try:
-        # PASTE YOUR SECRET API KEY HERE
-        genai.configure(api_key="PASTE_YOURGENAI_API_KEY") 
-
-        model = genai.GenerativeModel('gemini-2.5-flash') 
-        
-        prompt = f"""
-        You are Luna, a warm, empathetic, and knowledgeable menstrual health companion named Luna Sensai.
-        Your personality is like a caring and supportive friend. You use emojis 🌸💖✨😊.
-        You are talking to a user who needs support with their health, feelings, and well-being.
-        Keep your answers concise and supportive.
-        User's message: "{user_input}"
-        Luna's response:
-        """
-        
-        response = model.generate_content(prompt)
-        return response.text
+        return get_companion().reply(user_input)
 
     except Exception as e:
         print(f"Error getting AI response: {e}")
-        return "I'm having a little trouble connecting to my full knowledge right now, but I'm still here to listen. 💖"
\ No newline at end of file
+        return FALLBACK_RESPONSE
+
+class ChatStream:
+    """
+    Streams one response on a worker thread. The Tk loop calls `poll()` (e.g. from
+    root.after) to collect the chunks that have arrived; `cancel()` stops listening
+    straight away, and the stream ends with status 'timeout' once `timeout` seconds pass.
+    """
+    def __init__(self, user_input, companion=None, timeout=60.0):
+        self.user_input = user_input
+        self.companion = companion
+        self.timeout = timeout
+        self.status = 'pending' # pending -> streaming -> done / error / cancelled / timeout
+        self.error = None
+        self.time_to_first_chunk = None
+        self._chunks = queue.Queue()
+        self._cancelled = threading.Event()
+        self._started_at = None
+
+    def start(self):
+        self._started_at = time.monotonic()
+        self.status = 'streaming'
+        # Daemon thread: a request still waiting on the network must not keep the app open
+        threading.Thread(target=self._run, name="chat-stream", daemon=True).start()
+        return self
+
+    def _run(self):
+        try:
+            chunks = stream_ai_response(self.user_input, self.companion)
+            try:
+                for text in chunks:
+                    if self._cancelled.is_set():
+                        return
+                    self._chunks.put(('chunk', text))
+            finally:
+                chunks.close()
+            self._chunks.put(('done', None))
+        except Exception as e:
+            self._chunks.put(('error', e))
+
+    def cancel(self):
+        if not self.finished:
+            self._cancelled.set()
+            self.status = 'cancelled'
+
+    @property
+    def finished(self):
+        return self.status not in ('pending', 'streaming')
+
+    def poll(self):
+        """Returns the text chunks received since the last poll. Check `finished`/`status` afterwards."""
+        texts = []
+        while not self.finished:
+            try:
+                kind, payload = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'chunk':
+                if self.time_to_first_chunk is None:
+                    self.time_to_first_chunk = time.monotonic() - self._started_at
+                texts.append(payload)
+            elif kind == 'done':
+                self.status = 'done'
+            else:
+                print(f"Error getting AI response: {payload}")
+                self.error, self.status = payload, 'error'
+        if not self.finished and time.monotonic() - self._started_at > self.timeout:
+            self._cancelled.set()
+            self.status = 'timeout'
+        return texts
@@ -0,0 +1,271 @@
+"""
+Population-level statistics over every user's logs.
+
+The logs table is streamed in chunks (pd.read_sql_query with chunksize), in
+(user_id, date) order, and each chunk is folded into a CohortStats partial state:
+fixed-bin histograms and moments of sleep, stress and cramps, mood counts by cycle
+phase, and tag prevalence. Partial states merge by addition, so users can be split
+into id ranges (of about equal log counts), aggregated in a process pool and merged. Memory is bounded by the
+chunk size and the number of bins, moods and tags, not by the size of the table.
+
+A log's cycle phase comes from its day in the cycle: days since the user's latest
+logged period start (period_starts) on or before the log's date.
+
+Usage: python analytics.py [--chunk-size 50000] [--workers N] [--db path]
+"""
+import argparse
+import os
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import database as db
+
+ANALYTICS_CHUNK_SIZE = 50_000 # Log rows held in memory at once, per worker
+PARTITIONS_PER_WORKER = 4     # User id ranges per worker, so a heavy range doesn't leave the others idle
+
+# Bin edges per measure. Values outside the edges still count toward the moments.
+HISTOGRAM_BINS = {
+    'sleep_hours': np.arange(0, 24.5, 0.5),
+    'stress_level': np.arange(-0.5, 11, 1), # One bin per score, 0-10
+    'cramp_intensity': np.arange(-0.5, 11, 1),
+}
+
+# Cycle day -> phase: day 1-5 menstrual, 6-13 follicular, 14-16 ovulatory, 17 up to the
+# longest counted cycle luteal. Later days, and logs before a user's first logged
+# start, are 'unknown'.
+CYCLE_PHASES = ['menstrual', 'follicular', 'ovulatory', 'luteal']
+CYCLE_PHASE_STARTS = [1, 6, 14, 17, db.CYCLE_LENGTH_RANGE[1] + 1]
+UNKNOWN_PHASE = 'unknown'
+
+class CohortStats:
+    """Mergeable partial aggregates over a set of logs. Combine with merge(); read with the report methods."""
+
+    def __init__(self):
+        self.n_logs = 0
+        self.n_users = 0
+        self.histograms = {column: np.zeros(len(edges) - 1, dtype=np.int64) for column, edges in HISTOGRAM_BINS.items()}
+        # column -> [count, sum, sum of squares, min, max] of its non-null values
+        self.moments = {column: [0, 0.0, 0.0, np.inf, -np.inf] for column in HISTOGRAM_BINS}
+        self.mood_by_phase = Counter() # (phase, mood) -> logs
+        self.tag_logs = Counter()      # tag -> logs carrying it
+        self.tag_users = Counter()     # tag -> users who have used it
+
+    def merge(self, other):
+        """Adds another partial state (over different users) into this one. Returns self."""
+        self.n_logs += other.n_logs
+        self.n_users += other.n_users
+        for column in HISTOGRAM_BINS:
+            self.histograms[column] += other.histograms[column]
+            mine, theirs = self.moments[column], other.moments[column]
+            self.moments[column] = [mine[0] + theirs[0], mine[1] + theirs[1], mine[2] + theirs[2], min(mine[3], theirs[3]), max(mine[4], theirs[4])]
+        self.mood_by_phase.update(other.mood_by_phase)
+        self.tag_logs.update(other.tag_logs)
+        self.tag_users.update(other.tag_users)
+        return self
+
+    def add_logs(self, chunk, phases):
+        """Folds a chunk of logs (numeric columns already coerced) and each row's cycle phase into the state."""
+        self.n_logs += len(chunk)
+        for column, edges in HISTOGRAM_BINS.items():
+            values = chunk[column].to_numpy(dtype=float)
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            self.histograms[column] += np.histogram(values, bins=edges)[0]
+            moments = self.moments[column]
+            self.moments[column] = [moments[0] + len(values), moments[1] + values.sum(), moments[2] + np.square(values).sum(),
+                                    min(moments[3], values.min()), max(moments[4], values.max())]
+        moods = chunk['mood'].fillna('').astype(str).str.strip()
+        logged = moods != ''
+        counts = pd.DataFrame({'phase': phases[logged.to_numpy()], 'mood': moods[logged].to_numpy()}).groupby(['phase', 'mood']).size()
+        self.mood_by_phase.update(dict(counts.items()))
+
+    def distributions(self):
+        """One row per measure: count, mean, std, min, max and histogram-estimated median and 90th percentile."""
+        rows = {}
+        for column, edges in HISTOGRAM_BINS.items():
+            count, total, squares, low, high = self.moments[column]
+            mean = total / count if count else np.nan
+            std = np.sqrt(max(squares / count - mean * mean, 0.0)) if count else np.nan
+            rows[column] = {'count': count, 'mean': mean, 'std': std, 'min': low if count else np.nan, 'max': high if count else np.nan,
+                            'p50': histogram_quantile(edges, self.histograms[column], 0.5),
+                            'p90': histogram_quantile(edges, self.histograms[column], 0.9)}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def histogram(self, column):
+        """The bin counts for one measure, indexed by bin interval."""
+        edges = HISTOGRAM_BINS[column]
+        return pd.Series(self.histograms[column], index=pd.IntervalIndex.from_breaks(edges, closed='left'), name=column)
+
+    def mood_frequencies(self):
+        """Share of each mood within each cycle phase (rows: phases, columns: moods)."""
+        if not self.mood_by_phase:
+            return pd.DataFrame()
+        counts = pd.Series(self.mood_by_phase).unstack(fill_value=0)
+        counts = counts.reindex([p for p in CYCLE_PHASES + [UNKNOWN_PHASE] if p in counts.index])
+        return counts.div(counts.sum(axis=1), axis=0)
+
+    def tag_prevalence(self):
+        """Per tag: logs and users carrying it, and their share of all logs and users, most widespread first."""
+        if not self.tag_logs:
+            return pd.DataFrame(columns=['logs', 'users', 'share_of_logs', 'share_of_users'])
+        df = pd.DataFrame({'logs': pd.Series(self.tag_logs), 'users': pd.Series(self.tag_users)}).fillna(0).astype(np.int64)
+        df['share_of_logs'] = df['logs'] / self.n_logs if self.n_logs else np.nan
+        df['share_of_users'] = df['users'] / self.n_users if self.n_users else np.nan
+        return df.sort_values(['users', 'logs'], ascending=False)
+
+def histogram_quantile(edges, counts, q):
+    """Estimates quantile `q` from binned counts, interpolating linearly within the bin it falls in."""
+    total = counts.sum()
+    if not total:
+        return np.nan
+    cumulative = np.cumsum(counts)
+    i = int(np.searchsorted(cumulative, q * total))
+    before = cumulative[i - 1] if i else 0
+    return edges[i] + (edges[i + 1] - edges[i]) * (q * total - before) / counts[i]
+
+def _day_numbers(dates):
+    """'YYYY-MM-DD' strings to days since the epoch, NaT for unparseable dates."""
+    return pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce').to_numpy().astype('datetime64[D]')
+
+def cycle_phases(user_ids, days, start_user_ids, start_days):
+    """
+    The cycle phase of each log, given its user and day and every period start of those
+    users (sorted by user, then day). Vectorized: one searchsorted over (user, day) keys.
+    """
+    phases = np.full(len(user_ids), UNKNOWN_PHASE, dtype=object)
+    known = ~np.isnat(days)
+    if not len(start_user_ids) or not known.any():
+        return phases
+    # Pack (user, day) into one sortable int64: user in the high 32 bits
+    log_keys = (user_ids[known].astype(np.int64) << 32) + days[known].astype(np.int64) + (1 << 31)
+    start_keys = (start_user_ids.astype(np.int64) << 32) + start_days.astype(np.int64) + (1 << 31)
+    latest = np.searchsorted(start_keys, log_keys, side='right') - 1
+    has_start = (latest >= 0) & (start_user_ids[np.maximum(latest, 0)] == user_ids[known])
+    cycle_day = (days[known] - start_days[np.maximum(latest, 0)]).astype(np.int64) + 1
+    phase_index = np.searchsorted(CYCLE_PHASE_STARTS, cycle_day, side='right') - 1
+    in_cycle = has_start & (phase_index >= 0) & (phase_index < len(CYCLE_PHASES))
+    known_phases = np.full(len(log_keys), UNKNOWN_PHASE, dtype=object)
+    known_phases[in_cycle] = np.array(CYCLE_PHASES, dtype=object)[phase_index[in_cycle]]
+    phases[known] = known_phases
+    return phases
+
+def _new_users(user_ids, previous_user):
+    """Distinct users in a (user-ordered) chunk that weren't already counted from the previous one."""
+    unique = pd.unique(user_ids)
+    return len(unique) - int(len(unique) > 0 and unique[0] == previous_user)
+
+def _connect_read_only(database):
+    return sqlite3.connect(Path(database).resolve().as_uri() + "?mode=ro", uri=True)
+
+def partition_stats(database, first_user, last_user, chunk_size=ANALYTICS_CHUNK_SIZE):
+    """
+    Aggregates the logs of users first_user..last_user (inclusive) in chunks. Opens its own
+    read-only connection, so it can run in a worker process.
+    """
+    stats = CohortStats()
+    conn = _connect_read_only(database)
+    try:
+        params = (first_user, last_user)
+        previous_user = None
+        logs = pd.read_sql_query('''
+            SELECT user_id, date, mood, sleep_hours, stress_level, cramp_intensity FROM logs
+            WHERE user_id BETWEEN ? AND ? ORDER BY user_id, date
+        ''', conn, params=params, chunksize=chunk_size)
+        for chunk in logs:
+            if chunk.empty: # pandas yields one empty chunk when no user in the range has logs
+                continue
+            for column in HISTOGRAM_BINS: # Non-numeric text counts as missing, as in query_logs
+                chunk[column] = pd.to_numeric(chunk[column], errors='coerce')
+            user_ids = chunk['user_id'].to_numpy(dtype=np.int64)
+            # Only the period starts of this chunk's users are read
+            starts = pd.read_sql_query(
+                "SELECT user_id, start_date FROM period_starts WHERE user_id BETWEEN ? AND ? ORDER BY user_id, start_date",
+                conn, params=(int(user_ids[0]), int(user_ids[-1])))
+            phases = cycle_phases(user_ids, _day_numbers(chunk['date']), starts['user_id'].to_numpy(dtype=np.int64), _day_numbers(starts['start_date']))
+            stats.add_logs(chunk, phases)
+            stats.n_users += _new_users(user_ids, previous_user)
+            previous_user = user_ids[-1]
+
+        # Tags in (user, tag) order, so a user's tags split across two chunks are counted once
+        previous_user, previous_tags = None, set()
+        tags = pd.read_sql_query("SELECT user_id, tag FROM log_tags WHERE user_id BETWEEN ? AND ? ORDER BY user_id, tag",
+                                 conn, params=params, chunksize=chunk_size)
+        for chunk in tags:
+            if chunk.empty:
+                continue
+            stats.tag_logs.update(dict(chunk['tag'].value_counts().items()))
+            pairs = chunk.drop_duplicates()
+            pairs = pairs[~((pairs['user_id'] == previous_user) & pairs['tag'].isin(previous_tags))]
+            stats.tag_users.update(dict(pairs['tag'].value_counts().items()))
+            last_user = chunk['user_id'].iloc[-1]
+            last_tags = set(chunk.loc[chunk['user_id'] == last_user, 'tag'])
+            previous_tags = previous_tags | last_tags if last_user == previous_user else last_tags
+            previous_user = last_user
+    finally:
+        conn.close()
+    return stats
+
+def user_partitions(database, n_partitions):
+    """
+    Splits the users with logs into up to `n_partitions` contiguous (first, last) id ranges
+    of about equal log counts. Every range starts and ends on a logged user.
+    """
+    conn = _connect_read_only(database)
+    try:
+        counts = np.array(conn.execute("SELECT user_id, COUNT(*) FROM logs GROUP BY user_id ORDER BY user_id").fetchall(), dtype=np.int64).reshape(-1, 2)
+    finally:
+        conn.close()
+    if not len(counts):
+        return []
+    user_ids, cumulative = counts[:, 0], np.cumsum(counts[:, 1])
+    # Index of the last user in each range: where the running log count passes each equal share
+    shares = cumulative[-1] * np.arange(1, n_partitions + 1) / n_partitions
+    lasts = np.unique(np.minimum(np.searchsorted(cumulative, shares), len(user_ids) - 1))
+    firsts = np.r_[0, lasts[:-1] + 1]
+    return [(int(user_ids[first]), int(user_ids[last])) for first, last in zip(firsts, lasts)]
+
+def cohort_stats(workers=1, chunk_size=ANALYTICS_CHUNK_SIZE, database=None):
+    """
+    Cohort statistics over every user's logs. workers=1 streams in this process; more (or
+    None, for one per core) partitions the logged users by id range across a process pool.
+    """
+    database = os.path.abspath(database or db.DATABASE_NAME)
+    db.flush_writes() # Include this process's queued saves
+    if workers == 1:
+        return partition_stats(database, -2**63, 2**63 - 1, chunk_size)
+    workers = workers or os.cpu_count()
+    stats = CohortStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(partition_stats, database, first, last, chunk_size)
+                   for first, last in user_partitions(database, workers * PARTITIONS_PER_WORKER)]
+        for future in futures:
+            stats.merge(future.result())
+    return stats
+
+def format_report(stats, top_tags=15):
+    with pd.option_context('display.width', 120, 'display.float_format', '{:.3f}'.format):
+        return "\n\n".join([
+            f"{stats.n_logs:,} logs from {stats.n_users:,} users",
+            "== Distributions ==\n" + str(stats.distributions()),
+            "== Mood share by cycle phase ==\n" + str(stats.mood_frequencies()),
+            "== Tag prevalence ==\n" + str(stats.tag_prevalence().head(top_tags)),
+        ])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cohort statistics over every user's logs.")
+    parser.add_argument('--chunk-size', type=int, default=ANALYTICS_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=1, help="worker processes (0: one per core)")
+    parser.add_argument('--db', default=db.DATABASE_NAME, help="database file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = cohort_stats(args.workers or None, args.chunk_size, args.db)
+    print(format_report(stats))
+    print(f"\nAggregated in {time.perf_counter() - start:.1f} s")
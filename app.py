@@ -1,13 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
 from datetime import datetime
+import importlib
+import threading
+import time
 
-# Import our new modules
+# Import our new modules. Only the database layer is needed for login; the heavy
+# ones (pandas, scikit-learn, matplotlib, Gemini) are imported in the background
+# while the login window is up and on first use after that.
 import database as db
-import ui_components
-import ml_models
-import ai_companion
+
+APP_MODULES = ('ui_components', 'ml_models', 'ai_companion', 'knowledge_base')
+
+def prefetch_app_modules():
+    """Imports APP_MODULES on a daemon thread. An import from the Tk thread waits for it rather than importing twice."""
+    def worker():
+        for name in APP_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"Could not prefetch {name}: {e}") # Raised again, on the Tk thread, where it is used
+    threading.Thread(target=worker, name="module-prefetch", daemon=True).start()
 
 class LoginWindow:
     # This class remains unchanged from the previous version.
@@ -43,6 +56,7 @@ class LoginWindow:
         ttk.Button(button_frame, text="Login", command=self.login, style='Login.TButton').pack(side='left', padx=10)
         ttk.Button(button_frame, text="Sign Up", command=self.signup, style='Login.TButton').pack(side='left', padx=10)
         self.login_window.protocol("WM_DELETE_WINDOW", self.root.destroy)
+        prefetch_app_modules()
 
     def login(self):
         username = self.username_entry.get()
@@ -71,6 +85,24 @@ class LoginWindow:
 
 
 class MenstrualHealthTracker:
+    MODEL_POLL_MS = 100 # How often the Tk loop checks whether the background models have arrived
+    WRITE_STATUS_MS = 1000 # How often the status bar shows the write-behind queue
+
+    # All tabs and the names of their creation functions in ui_components, in display order
+    TABS = [
+        ('🏠 Dashboard', 'create_dashboard_tab'),
+        ('🩸 Period Prediction', 'create_period_prediction_tab'),
+        ('📝 Daily Logging', 'create_daily_logging_tab'),
+        ('🔮 Forecasting', 'create_forecasting_tab'),
+        ('⏰ Reminders', 'create_reminders_tab'),
+        ('🧘 Meditate', 'create_meditate_tab'), # NEW TAB
+        ('🩺 Hormonal Health', 'create_symptom_checker_tab'),
+        ('📊 Graphs', 'create_graphs_tab'),
+        ('📅 Weekly Summary', 'create_weekly_summary_tab'),
+        ('📚 Learn', 'create_learn_tab'),
+        ('🤖 AI Companion Luna', 'create_chatbot_tab'),
+    ]
+
     def __init__(self, root, user_id):
         # Clear any previous widgets from the root window
         for widget in root.winfo_children():
@@ -86,17 +118,31 @@ class MenstrualHealthTracker:
         self.timer_id = None # For the meditation timer
 
         # --- Initialize Models and UI ---
+        import ml_models
         self.setup_styles()
-        # Train ML models from the ml_models module
-        self.mood_model, self.cramp_model, self.label_encoders = ml_models.train_mood_cramp_models()
+        # Load ML models on a worker thread (trains them only if the data or config changed)
+        # so the tabs render straight away; forecasting shows a "warming up" state until then.
+        self.mood_model, self.cramp_model, self.label_encoders = None, None, None
+        self.models_ready = False
+        self.model_future = ml_models.load_mood_cramp_models_in_background(compact=True) # mmap'd FlatForests: fast single-row forecasts
+        # Log and reminder saves are committed by a background writer in batches;
+        # exit_app waits for anything still queued.
+        db.start_write_behind()
+        self.write_failures_reported = 0 # Failed saves already reported to the user
+        self.root.protocol("WM_DELETE_WINDOW", self.exit_app)
         
         # Build the main interface
         self.create_header()
         self.create_widgets()
         self.create_status_bar()
+        self.root.after(self.MODEL_POLL_MS, self.poll_models)
+        self.root.after(self.WRITE_STATUS_MS, self.poll_write_status)
         
-        # Initial checks
-        self.check_reminders()
+        # Reminders fire from an in-memory schedule for as long as the app is open
+        from reminder_scheduler import ReminderScheduler
+        import ui_components
+        self.reminder_scheduler = ReminderScheduler(self.root, self.user_id, self.show_reminders, on_change=lambda: ui_components.update_dashboard_reminders(self))
+        self.reminder_scheduler.start()
 
     def setup_styles(self):
         style = ttk.Style()
@@ -120,6 +166,7 @@ class MenstrualHealthTracker:
         header_frame = ttk.Frame(self.root, style='TFrame')
         header_frame.pack(pady=20, fill='x', padx=20)
         try:
+            from PIL import Image, ImageTk
             img = Image.open("icon.png").resize((64, 64), Image.LANCZOS)
             self.app_icon = ImageTk.PhotoImage(img)
             icon_label = ttk.Label(header_frame, image=self.app_icon, style='TLabel')
@@ -127,47 +174,88 @@ class MenstrualHealthTracker:
         except FileNotFoundError:
             pass
         ttk.Label(header_frame, text="Luna Sensai", style='Header.TLabel').pack(side='left')
-        exit_button = ttk.Button(header_frame, text="Exit", command=self.root.destroy, style='TButton')
+        exit_button = ttk.Button(header_frame, text="Exit", command=self.exit_app, style='TButton')
         exit_button.pack(side='right', padx=10)
 
     def create_widgets(self):
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(pady=10, padx=10, expand=True, fill='both')
-        
-        # Use a dictionary to define all tabs and their creation functions from ui_components
-        tabs = {
-            '🏠 Dashboard': ui_components.create_dashboard_tab,
-            '🩸 Period Prediction': ui_components.create_period_prediction_tab,
-            '📝 Daily Logging': ui_components.create_daily_logging_tab,
-            '🔮 Forecasting': ui_components.create_forecasting_tab,
-            '⏰ Reminders': ui_components.create_reminders_tab,
-            '🧘 Meditate': ui_components.create_meditate_tab, # NEW TAB
-            '🩺 Hormonal Health': ui_components.create_symptom_checker_tab,
-            '📊 Graphs': ui_components.create_graphs_tab,
-            '📅 Weekly Summary': ui_components.create_weekly_summary_tab,
-            '📚 Learn': ui_components.create_learn_tab,
-            '🤖 AI Companion Luna': ui_components.create_chatbot_tab
-        }
-
-        for i, (text, creation_func) in enumerate(tabs.items()):
+
+        # Tabs start as empty frames and are built the first time they are selected,
+        # so login only pays for the visible one.
+        self.tab_frames = []
+        self.built_tabs = set()
+        self.tab_build_times = {} # Tab text -> seconds its creation function took
+        for i, (text, _) in enumerate(self.TABS):
             frame = ttk.Frame(self.notebook)
             self.notebook.add(frame, text=text)
-            creation_func(self, frame) # Pass the main app instance 'self' to each function
+            self.tab_frames.append(frame)
             if 'Daily Logging' in text:
                 self.logging_tab_index = i
+        self.notebook.bind('<<NotebookTabChanged>>', lambda event: self.ensure_tab(self.notebook.index('current')))
+        self.ensure_tab(0)
+
+    def ensure_tab(self, index):
+        """Builds tab `index` if it has not been built yet. Returns its frame."""
+        frame = self.tab_frames[index]
+        if index not in self.built_tabs:
+            self.built_tabs.add(index)
+            import ui_components
+            text, func_name = self.TABS[index]
+            start = time.perf_counter()
+            getattr(ui_components, func_name)(self, frame) # Pass the main app instance 'self' to each function
+            self.tab_build_times[text] = time.perf_counter() - start
+        return frame
 
     def create_status_bar(self):
         status_frame = ttk.Frame(self.root, style='TFrame', relief='sunken')
         status_frame.pack(side='bottom', fill='x')
         ttk.Label(status_frame, text=f"Logged in as: {self.username}", style='TLabel', padding=(5,2)).pack(side='left')
+        self.model_status = ttk.Label(status_frame, text="🔮 Models warming up...", style='TLabel', padding=(5,2))
+        self.model_status.pack(side='left', padx=10)
+        self.write_status = ttk.Label(status_frame, text="", style='TLabel', padding=(5,2))
+        self.write_status.pack(side='left', padx=10)
         ttk.Label(status_frame, text=f"Today: {datetime.now().strftime('%Y-%m-%d')}", style='TLabel', padding=(5,2)).pack(side='right')
 
-    def check_reminders(self):
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        reminders = db.get_reminders_for_date(self.user_id, today_str)
-        if reminders:
-            reminder_text = "\n".join(f"• {r}" for r in reminders)
-            messagebox.showinfo("Today's Reminders ✨", f"You have the following reminders for today:\n\n{reminder_text}")
+    def poll_models(self):
+        """Checks (from the Tk loop) whether the background model load has finished."""
+        import ml_models, ui_components
+        if not self.model_future.done():
+            self.root.after(self.MODEL_POLL_MS, self.poll_models)
+            return
+        try:
+            self.mood_model, self.cramp_model, self.label_encoders = self.model_future.result()
+            self.model_status.config(text="🔮 Models ready")
+        except Exception as e:
+            self.model_status.config(text="🔮 Forecasting unavailable")
+            ml_models.show_model_error(e)
+        self.models_ready = True
+        ui_components.on_models_ready(self)
+
+    def poll_write_status(self):
+        """Shows pending saves and recent commit latency from the write-behind queue, and reports failed saves."""
+        stats = db.write_behind_stats()
+        if stats and stats['failed'] > self.write_failures_reported:
+            new_failures, self.write_failures_reported = stats['failed'] - self.write_failures_reported, stats['failed']
+            self.write_status.config(text=f"⚠️ {stats['failed']} save(s) failed")
+            messagebox.showerror("Save Error", f"{new_failures} of your entries could not be saved.\n\nError: {stats['last_error']}")
+        elif stats and stats['depth']:
+            self.write_status.config(text=f"💾 Saving {stats['depth']}...")
+        elif stats and 'commit_ms_p95' in stats:
+            failed_note = f" ⚠️ {stats['failed']} failed" if stats['failed'] else ""
+            self.write_status.config(text=f"💾 Saved (p95 {stats['commit_ms_p95']:.0f} ms){failed_note}")
+        self.root.after(self.WRITE_STATUS_MS, self.poll_write_status)
+
+    def exit_app(self):
+        """Commits any queued saves, then closes the app."""
+        self.reminder_scheduler.stop()
+        db.flush_writes()
+        self.root.destroy()
+
+    def show_reminders(self, reminders):
+        """Called by the reminder scheduler when reminders come due."""
+        reminder_text = "\n".join(f"• {r}" for r in reminders)
+        messagebox.showinfo("Today's Reminders ✨", f"You have the following reminders for today:\n\n{reminder_text}")
 
 if __name__ == "__main__":
     db.init_db()  # Initialize the database on startup
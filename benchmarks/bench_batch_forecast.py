@@ -0,0 +1,68 @@
+"""
+Throughput of the batch mood/cramp forecasting API in rows per second, against
+predicting one row per call, plus a nightly cohort forecast over a synthetic
+database.
+
+Usage: python benchmarks/bench_batch_forecast.py [cohort_users]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import ml_models
+
+BATCH_SIZES = (1, 100, 10_000, 100_000)
+SINGLE_ROW_CALLS = 50
+
+
+def random_rows(n, rng):
+    return np.column_stack([rng.integers(18, 46, n), rng.uniform(17, 35, n), rng.integers(1, 11, n), rng.uniform(4, 10, n)])
+
+
+def main(cohort_users=2000):
+    models = ml_models.load_mood_cramp_models()
+    rng = np.random.default_rng(0)
+
+    rows = random_rows(SINGLE_ROW_CALLS, rng)
+    start = time.perf_counter()
+    for row in rows:
+        ml_models.predict_mood_cramps(*models, [row])
+    single = SINGLE_ROW_CALLS / (time.perf_counter() - start)
+    print(f"{'rows per call':>14}{'rows/sec':>14}")
+    print(f"{'1 (loop)':>14}{single:>14,.0f}")
+    for n in BATCH_SIZES:
+        X = random_rows(n, rng)
+        start = time.perf_counter()
+        ml_models.predict_mood_cramps(*models, X)
+        print(f"{n:>14,}{n / (time.perf_counter() - start):>14,.0f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+        today = date.today()
+        for user_id in range(1, cohort_users + 1):
+            db.save_user_profile(user_id, random.randint(18, 45), random.uniform(17, 35))
+        conn = db.get_connection()
+        logs = [dict(user_id=u, date=(today - timedelta(days=d)).isoformat(), mood="Calm", sleep_hours=random.uniform(4, 10),
+                     stress_level=random.randint(1, 10), cramp_intensity=random.randint(1, 10), custom_tags=None)
+                for u in range(1, cohort_users + 1) for d in range(14)]
+        with conn:
+            db._update_rollups(conn, logs)
+        start = time.perf_counter()
+        forecasts = ml_models.forecast_cohort(*models)
+        db.save_cohort_forecasts(forecasts)
+        elapsed = time.perf_counter() - start
+        db.close_connections()
+    print(f"nightly cohort forecast: {len(forecasts):,} users in {elapsed * 1000:.0f} ms ({len(forecasts) / elapsed:,.0f} users/sec)")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,83 @@
+"""
+Throughput of bulk log import and export in rows per second, for each file
+format, against saving the same logs one add_log call at a time.
+
+Usage: python benchmarks/bench_bulk_logs.py [rows]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+ADD_LOG_ROWS = 2000
+HISTORY_DAYS = 3650 # Rows cycle through ten years of dates
+MOODS = ["Happy", "Calm", "Tired", "Sad", "Anxious", "Energetic"]
+TAGS = [None, "", "headache", "bloating, headache", "acne", "travel, poor sleep"]
+
+
+def random_record(day):
+    return {
+        'Date': day.isoformat(), 'Breakfast': "Oats", 'Lunch': "Salad", 'Dinner': "Pasta",
+        'Mood': random.choice(MOODS), 'Sleep Hours': round(random.uniform(4, 10), 1),
+        'Stress Level': random.randint(1, 10), 'Physical Activity': random.choice(["Low", "Moderate", "High"]),
+        'Cramp Intensity': random.randint(1, 10), 'PCOS': random.randint(0, 1), 'Thyroid': 0,
+        'Notes': "Felt okay", 'Custom Tags': random.choice(TAGS),
+    }
+
+
+def formats():
+    try:
+        import pyarrow  # noqa: F401
+        return ('csv', 'jsonl', 'parquet')
+    except ImportError:
+        return ('csv', 'jsonl')
+
+
+def main(rows=1_000_000):
+    random.seed(0)
+    first_day = date.today() - timedelta(days=HISTORY_DAYS)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        start = time.perf_counter()
+        for i in range(ADD_LOG_ROWS):
+            db.add_log(1, random_record(first_day + timedelta(days=i % HISTORY_DAYS)))
+        add_log_rate = ADD_LOG_ROWS / (time.perf_counter() - start)
+
+        source = os.path.join(tmp, "source.csv")
+        with open(source, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=db.LOG_FIELDS)
+            writer.writeheader()
+            writer.writerows(random_record(first_day + timedelta(days=i % HISTORY_DAYS)) for i in range(rows))
+
+        start = time.perf_counter()
+        seeded = db.import_logs(2, source)
+        seed_rate = seeded / (time.perf_counter() - start)
+
+        print(f"add_log, one row per call: {add_log_rate:,.0f} rows/sec")
+        print(f"import_logs, generated CSV: {seed_rate:,.0f} rows/sec ({seeded:,} rows)")
+        print(f"{'format':>8}{'export rows/sec':>18}{'import rows/sec':>18}{'file MB':>10}")
+        for i, fmt in enumerate(formats()):
+            # Export the seeded user, then import that file for a fresh user
+            path = os.path.join(tmp, f"logs.{fmt}")
+            start = time.perf_counter()
+            exported = db.export_logs(2, path)
+            export_s = time.perf_counter() - start
+            start = time.perf_counter()
+            imported = db.import_logs(10 + i, path)
+            import_s = time.perf_counter() - start
+            assert exported == imported == rows
+            print(f"{fmt:>8}{rows / export_s:>18,.0f}{rows / import_s:>18,.0f}{os.path.getsize(path) / 1e6:>10.1f}")
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,75 @@
+"""
+Cohort analytics throughput (log rows per second) in-process and across a process
+pool, and the in-process peak of Python allocations at growing table sizes, which
+should stay flat for a fixed chunk size.
+
+Usage: python benchmarks/bench_cohort_analytics.py [users] [days_per_user]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+import database as db
+
+MOODS = ["Happy", "Calm", "Tired", "Sad", "Anxious", "Energetic"]
+TAGS = [None, "headache", "bloating, headache", "acne", "travel, poor sleep"]
+CHUNK_SIZE = 20_000
+
+
+def seed_users(tmp, first_user, users, days):
+    """Imports `days` daily logs and their period starts for each of `users` new users."""
+    first_day = date.today() - timedelta(days=days)
+    path = os.path.join(tmp, "user.csv")
+    for user_id in range(first_user, first_user + users):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=db.LOG_FIELDS)
+            writer.writeheader()
+            for d in range(days):
+                writer.writerow({'Date': (first_day + timedelta(days=d)).isoformat(), 'Mood': random.choice(MOODS),
+                                 'Sleep Hours': round(random.uniform(4, 10), 1), 'Stress Level': random.randint(1, 10),
+                                 'Cramp Intensity': random.randint(1, 10), 'Custom Tags': random.choice(TAGS)})
+        db.import_logs(user_id, path)
+        for d in range(random.randint(0, 27), days, 28):
+            db.record_period_start(user_id, first_day + timedelta(days=d))
+
+
+def peak_mb():
+    tracemalloc.start()
+    analytics.cohort_stats(1, CHUNK_SIZE)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main(users=200, days_per_user=1000):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        print(f"{'log rows':>10}{'peak MB (1 process)':>22}")
+        for step in range(4):
+            seed_users(tmp, step * users // 4 + 1, users // 4, days_per_user)
+            print(f"{(step + 1) * (users // 4) * days_per_user:>10,}{peak_mb():>22.1f}")
+
+        rows = (users // 4) * 4 * days_per_user
+        print(f"\n{'workers':>8}{'rows/sec':>14}{'seconds':>10}")
+        for workers in (1, 2, os.cpu_count()):
+            start = time.perf_counter()
+            stats = analytics.cohort_stats(workers, CHUNK_SIZE)
+            elapsed = time.perf_counter() - start
+            assert stats.n_logs == rows
+            print(f"{workers:>8}{rows / elapsed:>14,.0f}{elapsed:>10.2f}")
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,75 @@
+"""
+Seeds a large synthetic database and measures get_logs / get_reminders_for_date
+latency with only the base schema (no indexes), then again after the index
+migrations have been applied.
+
+Usage: python benchmarks/bench_db_indexes.py [users] [days_per_user]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+REMINDERS_PER_USER = 20
+QUERIES = 200
+
+
+def seed(conn, users, days):
+    start = date(2020, 1, 1)
+    dates = [(start + timedelta(days=d)).isoformat() for d in range(days)]
+    moods = ["Happy", "Sad", "Tired", "Calm", "Anxious"]
+    with conn:
+        conn.executemany("INSERT INTO users (username, password_hash) VALUES (?, ?)",
+                         ((f"user{u}", db.hash_password("pw")) for u in range(users)))
+        # Interleave users day by day, the way a shared database actually fills up
+        conn.executemany(
+            "INSERT INTO logs (user_id, date, mood, sleep_hours, stress_level, cramp_intensity, pcos, thyroid, custom_tags)"
+            " VALUES (?, ?, ?, ?, ?, ?, 0, 0, ?)",
+            ((u, d, random.choice(moods), random.uniform(4, 10), random.randint(1, 10), random.randint(1, 10), "cramps,tired")
+             for d in dates for u in range(1, users + 1)))
+        conn.executemany("INSERT INTO reminders (user_id, reminder_date, message) VALUES (?, ?, ?)",
+                         ((u, random.choice(dates), "Take vitamins") for u in range(1, users + 1) for _ in range(REMINDERS_PER_USER)))
+
+
+def measure(users, days):
+    user_ids = [random.randint(1, users) for _ in range(QUERIES)]
+    day = (date(2020, 1, 1) + timedelta(days=days // 2)).isoformat()
+    start = time.perf_counter()
+    for user_id in user_ids:
+        db.get_logs(user_id)
+    logs_ms = (time.perf_counter() - start) / QUERIES * 1000
+    start = time.perf_counter()
+    for user_id in user_ids:
+        db.get_reminders_for_date(user_id, day)
+    reminders_ms = (time.perf_counter() - start) / QUERIES * 1000
+    return logs_ms, reminders_ms
+
+
+def main(users=1000, days=365):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        conn = db.get_connection()
+        db.run_migrations(conn, target_version=1)
+        seed(conn, users, days)
+        print(f"seeded {users * days:,} logs and {users * REMINDERS_PER_USER:,} reminders for {users:,} users")
+
+        before = measure(users, days)
+        db.run_migrations(conn)
+        after = measure(users, days)
+        db.close_connections()
+
+    print(f"{'query':<26}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    for name, b, a in zip(("get_logs", "get_reminders_for_date"), before, after):
+        print(f"{name:<26}{b:>14.3f}{a:>14.3f}{b / a:>9.1f}x")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
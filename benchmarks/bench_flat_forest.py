@@ -0,0 +1,86 @@
+"""
+Compares scikit-learn's RandomForestClassifier with the compiled FlatForest
+format: on-disk size, load time, single-row latency, batch throughput, and an
+exact-equality check of the predicted probabilities; then throughput and peak
+allocation of predict_proba across batch sizes (the flat forest's peak should
+grow with the batch only as the output does).
+
+Usage: python benchmarks/bench_flat_forest.py
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ml_models
+
+SINGLE_ROW_CALLS = 200
+BATCH = 100_000
+BATCH_SIZES = (1, 100, 1_000, 10_000, 100_000)
+
+
+def timed(fn, repeats=1):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats, result
+
+
+def main():
+    models = ml_models.load_mood_cramp_models()
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(15, 50, BATCH), rng.uniform(15, 40, BATCH), rng.integers(0, 12, BATCH), np.round(rng.uniform(3, 11, BATCH), 1)])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, "models.pkl")
+        with open(pickle_path, 'wb') as f:
+            pickle.dump(models, f, protocol=pickle.HIGHEST_PROTOCOL)
+        flat_dir = os.path.join(tmp, "flat")
+        ml_models.export_flat_models(models, flat_dir)
+        pickle_kb = os.path.getsize(pickle_path) / 1024
+        flat_kb = sum(os.path.getsize(os.path.join(flat_dir, n)) for n in os.listdir(flat_dir)) / 1024
+
+        def load_pickle():
+            with open(pickle_path, 'rb') as f:
+                return pickle.load(f)
+        pickle_load, _ = timed(load_pickle, 10)
+        flat_load, flat = timed(lambda: ml_models.load_flat_models(flat_dir), 10)
+
+        print(f"{'':<28}{'sklearn':>12}{'flat':>12}")
+        print(f"{'size on disk (KB)':<28}{pickle_kb:>12.0f}{flat_kb:>12.0f}")
+        print(f"{'load (ms)':<28}{pickle_load * 1000:>12.2f}{flat_load * 1000:>12.2f}")
+        for name, sk, fl in (("mood", models[0], flat[0]), ("cramp", models[1], flat[1])):
+            sk_one, _ = timed(lambda: sk.predict_proba(X[:1]), SINGLE_ROW_CALLS)
+            fl_one, _ = timed(lambda: fl.predict_proba(X[:1]), SINGLE_ROW_CALLS)
+            sk_batch, sk_proba = timed(lambda: sk.predict_proba(X))
+            fl_batch, fl_proba = timed(lambda: fl.predict_proba(X))
+            print(f"{name + ' single row (ms)':<28}{sk_one * 1000:>12.3f}{fl_one * 1000:>12.3f}")
+            print(f"{name + ' batch (rows/sec)':<28}{BATCH / sk_batch:>12,.0f}{BATCH / fl_batch:>12,.0f}")
+            print(f"{name + ' identical proba':<28}{str(np.array_equal(sk_proba, fl_proba)):>24}")
+
+        print(f"\n{'mood batch size':<16}{'sklearn rows/s':>16}{'flat rows/s':>14}{'sklearn peak MB':>17}{'flat peak MB':>14}")
+        for size in BATCH_SIZES:
+            rows = X[:size]
+            repeats = max(1, 1_000 // size)
+            sk_time, _ = timed(lambda: models[0].predict_proba(rows), repeats)
+            fl_time, _ = timed(lambda: flat[0].predict_proba(rows), repeats)
+            print(f"{size:<16,}{size / sk_time:>16,.0f}{size / fl_time:>14,.0f}"
+                  f"{peak_mb(lambda: models[0].predict_proba(rows)):>17.1f}{peak_mb(lambda: flat[0].predict_proba(rows)):>14.1f}")
+
+
+def peak_mb(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+if __name__ == "__main__":
+    main()
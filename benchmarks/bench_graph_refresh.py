@@ -0,0 +1,88 @@
+"""
+Cost of the Graphs tab's refresh with years of daily logs: the first draw, and a
+refresh after one more day is logged, against the old full redraw (refetch every
+log, clear the axes, replot, tight_layout, draw). Renders off-screen with Agg.
+
+Usage: python benchmarks/bench_graph_refresh.py [years]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import ui_components
+
+REFRESHES = 20
+
+
+def make_app(user_id):
+    colors = {'bg': '#FFF0F5', 'primary': '#E6E6FA', 'secondary': '#DDA0DD', 'accent': '#9370DB'}
+    fig, ax = plt.subplots(figsize=(7, 4), facecolor=colors['bg'])
+    return SimpleNamespace(user_id=user_id, colors=colors, fig=fig, ax=ax, graph_canvas=fig.canvas)
+
+
+def log_day(user_id, day):
+    db.add_log(user_id, {'Date': day.isoformat(), 'Mood': random.choice(list(ui_components.MOOD_INDEX)),
+                         'Cramp Intensity': random.randint(1, 10), 'Stress Level': random.randint(1, 10)})
+
+
+def full_redraw(app):
+    """The pre-incremental plot_graphs."""
+    df = db.query_logs(app.user_id, ['date', 'mood', 'cramp_intensity'])
+    app.ax.clear()
+    df['mood_num'] = df['mood'].map(ui_components.MOOD_INDEX)
+    app.ax.plot(df['date'], df['mood_num'], marker='o', linestyle='-', label='Mood')
+    app.ax.plot(df['date'], df['cramp_intensity'], marker='x', linestyle='--', label='Cramp Intensity')
+    app.ax.legend()
+    locator = mdates.AutoDateLocator()
+    app.ax.xaxis.set_major_locator(locator); app.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    app.fig.tight_layout(); app.fig.canvas.draw()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(years=5):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+        first_day = date.today() - timedelta(days=365 * years)
+        days = [first_day + timedelta(days=d) for d in range(365 * years)]
+        for day in days:
+            log_day(1, day)
+
+        old, new = make_app(1), make_app(1)
+        old_first = timed(lambda: full_redraw(old))
+        # Agg's draw_idle renders immediately, so both sides include rendering
+        new_first = timed(lambda: ui_components.plot_graphs(new))
+        old_refresh, new_refresh = [], []
+        for i in range(REFRESHES):
+            log_day(1, days[-1] + timedelta(days=i + 1))
+            old_refresh.append(timed(lambda: full_redraw(old)))
+            new_refresh.append(timed(lambda: ui_components.plot_graphs(new)))
+        plotted = sum(len(line.get_xdata()) for line in new.graph_lines)
+        db.close_connections()
+
+    print(f"{len(days) + REFRESHES:,} daily logs, {plotted:,} points drawn after decimation (of {2 * len(new.graph_series[0]):,})")
+    print(f"{'':<18}{'full redraw (ms)':>18}{'incremental (ms)':>18}")
+    print(f"{'first draw':<18}{old_first * 1000:>18.1f}{new_first * 1000:>18.1f}")
+    print(f"{'refresh (mean)':<18}{sum(old_refresh) / REFRESHES * 1000:>18.1f}{sum(new_refresh) / REFRESHES * 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,51 @@
+"""
+Startup import cost, measured with `python -X importtime` in fresh interpreters.
+
+"login path" is what `import app` loads before the login window can appear;
+"app modules" is what the background prefetch loads while the user types. Exits
+with status 1 if any of HEAVY_MODULES has crept back onto the login path.
+
+Usage: python benchmarks/bench_import_time.py [top_n]
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ('pandas', 'numpy', 'sklearn', 'scipy', 'matplotlib', 'PIL', 'tkcalendar', 'google.generativeai')
+
+
+def import_times(statement):
+    """Runs `statement` under -X importtime. Returns {module: (self_us, cumulative_us)} for every module it imported."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main(top_n=10):
+    import app
+    login = import_times("import app")
+    modules = import_times("import " + ", ".join(app.APP_MODULES))
+
+    print(f"login path (import app): {sum(s for s, _ in login.values()) / 1000:.1f} ms, {len(login)} modules")
+    print(f"app modules (prefetched): {sum(s for s, _ in modules.values()) / 1000:.1f} ms, {len(modules)} modules")
+    print(f"\n{'heaviest on the login path':<40}{'cumulative (ms)':>16}")
+    for name, (_, cumulative) in sorted(login.items(), key=lambda item: -item[1][1])[:top_n]:
+        print(f"{name:<40}{cumulative / 1000:>16.1f}")
+
+    regressions = [m for m in HEAVY_MODULES if m in login]
+    if regressions:
+        print(f"\nREGRESSION: heavy modules imported before login: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo heavy modules on the login path.")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,68 @@
+"""
+Hit rate and latency of the local Q&A index, built on train.csv and queried with
+the held-out questions in test.csv.
+
+"answer sim" is the word TF-IDF cosine between the answer the index returns and
+the reference answer in test.csv, as a rough quality check for each threshold. A
+local answer with answer sim below WRONG_ANSWER_SIM counts as a wrong answer. Each
+threshold is reported on similarity alone and with lookup()'s full check
+(is_confident_match: same numbers, negations and content words).
+
+Usage: python benchmarks/bench_knowledge_base.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import knowledge_base as kb
+
+THRESHOLDS = (0.4, 0.5, 0.6, 0.7, 0.75, 0.8)
+WRONG_ANSWER_SIM = 0.3
+
+
+def main():
+    train_path = os.path.join(kb.SCRIPT_DIR, 'train.csv')
+    test = pd.read_csv(os.path.join(kb.SCRIPT_DIR, 'test.csv')).dropna()
+    queries, references = list(test[kb.QUESTION_COLUMN]), list(test[kb.ANSWER_COLUMN])
+
+    with tempfile.TemporaryDirectory() as store_dir:
+        start = time.perf_counter()
+        kb.load_index([train_path], store_dir)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        index = kb.load_index([train_path], store_dir)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    answers = TfidfVectorizer().fit([a for a, _, _ in results] + references)
+    answer_sim = np.asarray((answers.transform([a for a, _, _ in results]).multiply(answers.transform(references))).sum(axis=1)).ravel()
+    similarity = np.array([s for _, _, s in results])
+
+    print(f"index build {build_ms:.1f} ms, cached load {load_ms:.1f} ms, {len(index.questions)} questions")
+    print(f"search latency over {len(queries)} queries: p50 {np.percentile(latencies, 50):.3f} ms, "
+          f"p95 {np.percentile(latencies, 95):.3f} ms, max {max(latencies):.3f} ms")
+    print(f"{'threshold':>10}{'check':>12}{'hit rate':>10}{'wrong (of hits)':>17}{'answer sim (hits)':>20}{'answer sim (misses)':>22}")
+    for threshold in THRESHOLDS:
+        for check, hits in (("similarity", similarity >= threshold),
+                            ("full", np.array([kb.is_confident_match(q, m, s, threshold) for q, (_, m, s) in zip(queries, results)]))):
+            hit_sim = answer_sim[hits].mean() if hits.any() else float('nan')
+            miss_sim = answer_sim[~hits].mean() if (~hits).any() else float('nan')
+            wrong = (answer_sim[hits] < WRONG_ANSWER_SIM).mean() if hits.any() else float('nan')
+            marker = " <- lookup()" if threshold == kb.MIN_CONFIDENCE and check == "full" else ""
+            print(f"{threshold:>10.2f}{check:>12}{hits.mean():>10.1%}{wrong:>17.1%}{hit_sim:>20.2f}{miss_sim:>22.2f}{marker}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Compares cold training of the mood/cramp models with a warm load from the
+model artifact store.
+
+Usage: python benchmarks/bench_model_store.py [repeats]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ml_models
+
+
+def main(repeats=5):
+    file_path = os.path.join(ml_models.SCRIPT_DIR, ml_models.MOOD_CRAMP_DATASET)
+    cold_times, warm_times = [], []
+    with tempfile.TemporaryDirectory() as store_dir:
+        for _ in range(repeats):
+            for name in os.listdir(store_dir):
+                os.remove(os.path.join(store_dir, name))
+            start = time.perf_counter()
+            ml_models.load_mood_cramp_models(store_dir)
+            cold_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            models = ml_models.load_mood_cramp_models(store_dir)
+            warm_times.append(time.perf_counter() - start)
+            assert models[0] is not None
+
+        key = ml_models.model_artifact_key(file_path)
+        size_kb = os.path.getsize(os.path.join(store_dir, f"mood_cramp_{key}.pkl")) / 1024
+
+    cold, warm = min(cold_times), min(warm_times)
+    print(f"{'':<12}{'best (ms)':>12}{'mean (ms)':>12}")
+    print(f"{'cold train':<12}{cold * 1000:>12.1f}{sum(cold_times) / repeats * 1000:>12.1f}")
+    print(f"{'warm load':<12}{warm * 1000:>12.1f}{sum(warm_times) / repeats * 1000:>12.1f}")
+    print(f"speedup: {cold / warm:.1f}x, artifact size: {size_kb:.0f} KB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,70 @@
+"""
+Reading a user's history for charts and forecasting: query_logs plus type
+conversion against the snapshot cache, unchanged (a hit), after one more add_log
+(an in-place append) and cold from disk.
+
+Usage: python benchmarks/bench_snapshot_cache.py [years]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+import snapshot_cache
+
+REPEATS = 50
+COLUMNS = ['date', 'mood', 'sleep_hours', 'stress_level', 'cramp_intensity']
+
+
+def timed(fn, repeats=REPEATS):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main(years=10):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+        first_day = date.today() - timedelta(days=365 * years)
+        for d in range(365 * years):
+            db.add_log(1, {'Date': (first_day + timedelta(days=d)).isoformat(), 'Mood': random.choice(["Happy", "Calm", "Sad"]),
+                           'Sleep Hours': round(random.uniform(4, 10), 1), 'Stress Level': random.randint(1, 10),
+                           'Cramp Intensity': random.randint(1, 10)})
+        cache = snapshot_cache.SnapshotCache(directory=os.path.join(tmp, "snapshots"))
+        next_day = [date.today()]
+
+        def append():
+            next_day[0] += timedelta(days=1)
+            db.add_log(1, {'Date': next_day[0].isoformat(), 'Mood': "Calm", 'Cramp Intensity': 3})
+            cache.get(1)
+
+        def cold():
+            snapshot_cache.SnapshotCache(directory=cache.directory).get(1)
+
+        query_ms = timed(lambda: db.query_logs(1, COLUMNS))
+        build_ms = timed(lambda: (cache.invalidate(1), cache.get(1)), 5)
+        hit_ms = timed(lambda: cache.get(1).columns())
+        append_ms = timed(append)
+        cold_ms = timed(cold)
+        stats = cache.stats()
+        db.close_connections()
+
+    print(f"{365 * years:,} daily logs; snapshot {stats['bytes'] / 1e6:.2f} MB mapped")
+    print(f"{'read':<34}{'ms':>10}")
+    print(f"{'query_logs + conversion':<34}{query_ms:>10.3f}")
+    print(f"{'snapshot build':<34}{build_ms:>10.3f}")
+    print(f"{'snapshot hit':<34}{hit_ms:>10.3f}")
+    print(f"{'add_log + snapshot append':<34}{append_ms:>10.3f}")
+    print(f"{'snapshot cold from disk':<34}{cold_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,52 @@
+"""
+Login-to-interactive time of the main window, and what each tab costs to build.
+
+Opens MenstrualHealthTracker for a fresh user in a throwaway database, times
+construction plus the first full redraw (what login waits for, with only the
+visible tab built), then builds every remaining tab and reports each one's
+build time and the eager total that login used to pay. Needs a display.
+
+Usage: python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+from app import MenstrualHealthTracker
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+        db.add_user("bench", "bench")
+        user_id = db.check_user("bench", "bench")
+
+        root = tk.Tk()
+        start = time.perf_counter()
+        app = MenstrualHealthTracker(root, user_id)
+        root.update()
+        interactive = time.perf_counter() - start
+        lazy_tabs = dict(app.tab_build_times)
+
+        for index in range(len(app.TABS)):
+            app.ensure_tab(index)
+        root.update()
+        root.destroy()
+        db.close_connections()
+
+    print(f"login to interactive: {interactive * 1000:.0f} ms ({len(lazy_tabs)} of {len(app.TABS)} tabs built)")
+    print(f"{'tab':<26}{'build (ms)':>12}")
+    for text, seconds in sorted(app.tab_build_times.items(), key=lambda item: -item[1]):
+        marker = "  <- at login" if text in lazy_tabs else ""
+        print(f"{text:<26}{seconds * 1000:>12.1f}{marker}")
+    print(f"{'all tabs (eager)':<26}{sum(app.tab_build_times.values()) * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
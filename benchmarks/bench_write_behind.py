@@ -0,0 +1,68 @@
+"""
+Time the caller spends in add_log with synchronous commits against the
+write-behind queue (group commit), plus the queue's depth and commit latency.
+
+Usage: python benchmarks/bench_write_behind.py [saves]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+MOODS = ["Happy", "Calm", "Tired", "Sad", "Anxious", "Energetic"]
+
+
+def save_logs(user_id, saves):
+    """Calls add_log `saves` times. Returns the per-call latencies in seconds."""
+    first_day = date.today() - timedelta(days=saves)
+    latencies = []
+    for i in range(saves):
+        log = {'Date': (first_day + timedelta(days=i)).isoformat(), 'Mood': random.choice(MOODS),
+               'Cramp Intensity': random.randint(1, 10), 'Custom Tags': "headache, bloating"}
+        start = time.perf_counter()
+        db.add_log(user_id, log)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def describe(latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95)]
+    return f"{sum(latencies) / len(latencies) * 1e6:>12.0f}{p95 * 1e6:>12.0f}{latencies[-1] * 1e6:>12.0f}"
+
+
+def main(saves=5000):
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        start = time.perf_counter()
+        sync = save_logs(1, saves)
+        sync_total = time.perf_counter() - start
+
+        db.start_write_behind()
+        start = time.perf_counter()
+        queued = save_logs(2, saves)
+        db.flush_writes()
+        queued_total = time.perf_counter() - start
+        assert len(db.query_logs(2, ['id'])) == saves
+        stats = db.write_behind_stats()
+        db.close_connections()
+
+    print(f"{saves:,} add_log calls")
+    print(f"{'':<14}{'mean (us)':>12}{'p95 (us)':>12}{'max (us)':>12}{'saves/sec':>12}")
+    print(f"{'synchronous':<14}{describe(sync)}{saves / sync_total:>12,.0f}")
+    print(f"{'write-behind':<14}{describe(queued)}{saves / queued_total:>12,.0f}")
+    print(f"\n{stats['batches']} commits, {stats['mean_batch']:.0f} writes each on average, peak queue depth {stats['max_depth']}")
+    print(f"commit latency: p50 {stats['commit_ms_p50']:.1f} ms, p95 {stats['commit_ms_p95']:.1f} ms, max {stats['commit_ms_max']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -1,16 +1,244 @@
 import sqlite3
 import hashlib
-import pandas as pd
+import csv
+import json
+import os
+import threading
+import atexit
+import weakref
+import functools
+import queue
+import sys
+import time
+from collections import deque
+from datetime import date, timedelta
+# pandas is imported inside the DataFrame-returning functions: login only needs sqlite3 and hashlib
 
 DATABASE_NAME = "luna_sensai.db"
 
-def init_db():
-    """Initializes the database and creates/updates tables."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
+# --- Connection Manager ---
+# Each thread keeps one long-lived connection per database file, closed when the
+# thread finishes, instead of opening and closing a connection in every function. WAL journaling lets background
+# workers read while the UI thread writes.
+STATEMENT_CACHE_SIZE = 256 # Prepared statements kept per connection (sqlite3 caches them by SQL text)
+CONNECTION_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"), # Safe with WAL; only the last commits can be lost on power failure
+    ("cache_size", -16000),    # Negative means KiB, so ~16 MB of page cache
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+
+_local = threading.local()
+_all_connections = weakref.WeakSet() # Every live thread's _ThreadConnections
+_all_connections_lock = threading.Lock()
+
+class _ThreadConnections:
+    """
+    One thread's connections by database file. It is only referenced from that thread's
+    _local, so it is collected when the thread finishes, and the finalizer closes them.
+    """
+    def __init__(self):
+        self.connections = {}
+        weakref.finalize(self, _close_all, self.connections)
+
+def _close_all(connections):
+    for conn in list(connections.values()):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
+
+def _open_connection(database_name):
+    conn = sqlite3.connect(database_name, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+    for pragma, value in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+def get_connection():
+    """Returns the calling thread's long-lived connection to DATABASE_NAME, opening it on first use."""
+    holder = getattr(_local, 'connections', None)
+    if holder is None:
+        holder = _local.connections = _ThreadConnections()
+        with _all_connections_lock:
+            _all_connections.add(holder)
+    conn = holder.connections.get(DATABASE_NAME)
+    if conn is None:
+        conn = holder.connections[DATABASE_NAME] = _open_connection(DATABASE_NAME)
+    return conn
+
+def close_connections():
+    """Closes every connection still open in any thread. They are reopened on next use."""
+    with _all_connections_lock:
+        holders = list(_all_connections)
+    for holder in holders:
+        _close_all(holder.connections)
+
+atexit.register(close_connections)
+
+# --- Write-Behind Queue ---
+# Once start_write_behind() has been called, add_log and add_reminder return as soon
+# as the write is queued. A writer thread commits everything pending in one
+# transaction (group commit), so a slow or busy database file never blocks the Tk
+# thread. Reads wait for queued writes first, so callers always see their own saves.
+
+WRITE_QUEUE_SIZE = 1000 # Pending writes before add_log/add_reminder block (backpressure)
+WRITE_BATCH_SIZE = 500  # Most writes committed in one transaction
+
+class WriteBehindQueue:
+    def __init__(self, max_pending=WRITE_QUEUE_SIZE, max_batch=WRITE_BATCH_SIZE):
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._commit_seconds = deque(maxlen=1000) # Recent commit latencies
+        self.counters = {'writes': 0, 'batches': 0, 'failed': 0, 'max_depth': 0}
+        self.last_error = None # The most recent failed write's exception, for the UI to report
+        threading.Thread(target=self._run, name="db-writer", daemon=True).start()
+
+    def submit(self, write, *args):
+        """Queues write(conn, *args) to run on the writer thread inside a batch transaction."""
+        self._queue.put((write, args))
+        depth = self._queue.qsize()
+        with self._lock:
+            self.counters['max_depth'] = max(self.counters['max_depth'], depth)
+
+    def flush(self):
+        """Blocks until every write queued so far is committed (or has failed)."""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # Never let the writer thread die: flush() would then wait forever
+                self._record_failure(len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _record_failure(self, count, error):
+        print(f"Could not save queued write: {error}")
+        with self._lock:
+            self.counters['failed'] += count
+            self.last_error = error
+
+    def _commit(self, batch):
+        failed = 0
+        start = time.perf_counter()
+        try:
+            conn = get_connection()
+            with conn:
+                for write, args in batch:
+                    write(conn, *args)
+        except Exception:
+            # Retry one at a time so a single bad write doesn't lose the rest of the batch
+            for write, args in batch:
+                try:
+                    conn = get_connection()
+                    with conn:
+                        write(conn, *args)
+                except Exception as e:
+                    failed += 1
+                    self._record_failure(1, e)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.counters['writes'] += len(batch) - failed
+            self.counters['batches'] += 1
+            self._commit_seconds.append(elapsed)
+
+    def stats(self):
+        """Current and peak queue depth, write/batch/failure counts (and the last error) and commit latency (ms) over recent batches."""
+        with self._lock:
+            stats = dict(self.counters, last_error=self.last_error)
+            latencies = sorted(self._commit_seconds)
+        stats['depth'] = self._queue.qsize()
+        stats['mean_batch'] = stats['writes'] / stats['batches'] if stats['batches'] else 0.0
+        if latencies:
+            stats['commit_ms_p50'] = latencies[len(latencies) // 2] * 1000
+            stats['commit_ms_p95'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+            stats['commit_ms_max'] = latencies[-1] * 1000
+        return stats
+
+_write_behind = None
+
+def start_write_behind(max_pending=WRITE_QUEUE_SIZE, max_batch=WRITE_BATCH_SIZE):
+    """Routes add_log/add_reminder through the shared write-behind queue from now on. Returns the queue."""
+    global _write_behind
+    if _write_behind is None:
+        _write_behind = WriteBehindQueue(max_pending, max_batch)
+    return _write_behind
+
+def flush_writes():
+    """Waits for queued writes to commit. A no-op without write-behind."""
+    if _write_behind is not None:
+        _write_behind.flush()
+
+def write_behind_stats():
+    return _write_behind.stats() if _write_behind is not None else None
+
+def _write(write, *args):
+    """Runs write(conn, *args) in a transaction now, or queues it when write-behind is on."""
+    if _write_behind is not None:
+        _write_behind.submit(write, *args)
+        return
+    conn = get_connection()
+    with conn:
+        write(conn, *args)
+
+def _after_pending_writes(read):
+    """Decorates a read so it first waits for queued writes (read-your-writes)."""
+    @functools.wraps(read)
+    def wrapper(*args, **kwargs):
+        flush_writes()
+        return read(*args, **kwargs)
+    return wrapper
+
+atexit.register(flush_writes) # Registered after close_connections, so it runs before it
+
+# --- Change Listeners ---
+# In-process subscribers to writes, so views and schedulers can react to a save
+# instead of polling the database. Callbacks run synchronously on the thread that
+# made the call (the Tk thread, in the app), before a queued write has committed.
+#   'log'          (user_id,) after add_log or import_logs
+#   'reminder'     (user_id, reminder_date, message, recurrence)
+#   'period_start' (user_id, start_date)
+
+_listeners = {}
+
+def add_listener(event, callback):
+    _listeners.setdefault(event, []).append(callback)
+
+def remove_listener(event, callback):
+    if callback in _listeners.get(event, ()):
+        _listeners[event].remove(callback)
+
+def _notify(event, *args):
+    for callback in list(_listeners.get(event, ())):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"Error in {event} listener: {e}")
+
+# --- Schema Migrations ---
+# Migrations run once each, in order. PRAGMA user_version stores how many have been
+# applied, so startup only does work when the schema is actually behind.
+# An entry is either a single SQL statement or a function taking the connection.
+
+def _table_columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+def _migrate_base_schema(conn):
+    """Creates the users, logs and reminders tables (and upgrades pre-notes/tags databases)."""
     # Create users table
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -19,7 +247,7 @@ def init_db():
     ''')
     
     # Create logs table with new columns for notes and tags
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -41,7 +269,7 @@ def init_db():
     ''')
 
     # Create reminders table
-    cursor.execute('''
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS reminders (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
@@ -50,20 +278,163 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
-    # --- Schema Upgrade Section ---
+
     # Add notes and custom_tags columns if they don't exist (for users with old database)
-    try:
-        cursor.execute("ALTER TABLE logs ADD COLUMN notes TEXT")
-    except sqlite3.OperationalError:
-        pass # Column already exists
-    try:
-        cursor.execute("ALTER TABLE logs ADD COLUMN custom_tags TEXT")
-    except sqlite3.OperationalError:
-        pass # Column already exists
+    log_columns = _table_columns(conn, "logs")
+    for column in ("notes", "custom_tags"):
+        if column not in log_columns:
+            conn.execute(f"ALTER TABLE logs ADD COLUMN {column} TEXT")
+
+def _migrate_rollups(conn):
+    """Creates the per-user daily/weekly rollup tables and backfills them from existing logs."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_rollups (
+            user_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            log_count INTEGER NOT NULL DEFAULT 0,
+            sleep_sum REAL NOT NULL DEFAULT 0,
+            sleep_count INTEGER NOT NULL DEFAULT 0,
+            stress_sum REAL NOT NULL DEFAULT 0,
+            stress_count INTEGER NOT NULL DEFAULT 0,
+            cramp_sum REAL NOT NULL DEFAULT 0,
+            cramp_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period, period_start)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS mood_rollups (
+            user_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            mood TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period, period_start, mood)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS tag_rollups (
+            user_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            period_start TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, period, period_start, tag)
+        ) WITHOUT ROWID
+    ''')
+    _rebuild_rollups(conn)
+
+def _migrate_log_tags(conn):
+    """Creates the normalized log_tags table and fills it from existing custom_tags values."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_tags (
+            log_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (log_id, tag),
+            FOREIGN KEY (log_id) REFERENCES logs (id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_log_tags_user_tag ON log_tags (user_id, tag)")
+    cursor = conn.execute("SELECT id, user_id, custom_tags FROM logs WHERE custom_tags IS NOT NULL AND custom_tags != ''")
+    while True:
+        batch = cursor.fetchmany(5000)
+        if not batch:
+            break
+        _insert_log_tags(conn, batch)
+
+def _migrate_forecasting(conn):
+    """Adds per-user forecasting profiles and the table the nightly cohort forecast writes to."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_profiles (
+            user_id INTEGER PRIMARY KEY,
+            age REAL,
+            bmi REAL,
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cohort_forecasts (
+            user_id INTEGER NOT NULL,
+            week_start TEXT NOT NULL,
+            mood TEXT,
+            mood_confidence REAL,
+            cramp_high INTEGER,
+            cramp_probability REAL,
+            PRIMARY KEY (user_id, week_start)
+        ) WITHOUT ROWID
+    ''')
+
+def _migrate_cycles(conn):
+    """Adds logged period start dates and the running per-user cycle-length sums the cycle forecaster reads."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS period_starts (
+            user_id INTEGER NOT NULL,
+            start_date TEXT NOT NULL,
+            PRIMARY KEY (user_id, start_date)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS cycle_stats (
+            user_id INTEGER PRIMARY KEY,
+            n_cycles INTEGER NOT NULL DEFAULT 0,
+            length_sum REAL NOT NULL DEFAULT 0,
+            length_sq_sum REAL NOT NULL DEFAULT 0,
+            last_start TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+def _migrate_log_versions(conn):
+    """Adds a per-user counter that triggers bump whenever an existing log is edited or deleted, by any client."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS log_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    bump = "INSERT INTO log_versions (user_id, version) VALUES ({}.user_id, 1) ON CONFLICT (user_id) DO UPDATE SET version = version + 1;"
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS logs_version_update AFTER UPDATE ON logs BEGIN {bump.format('OLD')} {bump.format('NEW')} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS logs_version_delete AFTER DELETE ON logs BEGIN {bump.format('OLD')} END")
+
+MIGRATIONS = [
+    _migrate_base_schema,                                                                        # 1
+    "CREATE INDEX IF NOT EXISTS idx_logs_user_date ON logs (user_id, date)",                     # 2
+    "CREATE INDEX IF NOT EXISTS idx_reminders_user_date ON reminders (user_id, reminder_date)",  # 3
+    _migrate_rollups,                                                                            # 4
+    _migrate_log_tags,                                                                           # 5
+    _migrate_forecasting,                                                                        # 6
+    _migrate_cycles,                                                                             # 7
+    "ALTER TABLE reminders ADD COLUMN recurrence TEXT",                                          # 8
+    _migrate_log_versions,                                                                       # 9
+]
 
-    conn.commit()
-    conn.close()
+def get_schema_version(conn=None):
+    """Returns the number of migrations applied to the database."""
+    return (conn or get_connection()).execute("PRAGMA user_version").fetchone()[0]
+
+def run_migrations(conn=None, target_version=None):
+    """Applies pending migrations up to `target_version` (default: all), each in its own transaction."""
+    conn = conn or get_connection()
+    target_version = len(MIGRATIONS) if target_version is None else target_version
+    for version in range(get_schema_version(conn) + 1, target_version + 1):
+        migration = MIGRATIONS[version - 1]
+        conn.execute("BEGIN")
+        try:
+            if callable(migration):
+                migration(conn)
+            else:
+                conn.execute(migration)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def init_db():
+    """Initializes the database and brings the schema up to date."""
+    run_migrations()
 
 def hash_password(password):
     """Hashes the password for secure storage."""
@@ -71,76 +442,627 @@ def hash_password(password):
 
 def add_user(username, password):
     """Adds a new user to the database."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
+    conn = get_connection()
     password_hash = hash_password(password)
     try:
-        cursor.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
-        conn.commit()
+        with conn:
+            conn.execute("INSERT INTO users (username, password_hash) VALUES (?, ?)", (username, password_hash))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def check_user(username, password):
     """Checks if a user exists and the password is correct."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
     password_hash = hash_password(password)
-    cursor.execute("SELECT id, password_hash FROM users WHERE username = ?", (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = get_connection().execute("SELECT id, password_hash FROM users WHERE username = ?", (username,)).fetchone()
     if user and user[1] == password_hash:
         return user[0]
     return None
 
 def get_username(user_id):
     """Gets the username for a given user_id."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT username FROM users WHERE id = ?", (user_id,))
-    username = cursor.fetchone()
-    conn.close()
+    username = get_connection().execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
     return username[0] if username else "Unknown"
 
-def add_log(user_id, log_data):
-    """Adds a daily log for a specific user, including notes and tags."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO logs (user_id, date, breakfast, lunch, dinner, mood, sleep_hours, stress_level, physical_activity, cramp_intensity, pcos, thyroid, notes, custom_tags)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+# Insert column order for logs, shared by every write path
+LOG_INSERT_COLUMNS = ('user_id', 'date', 'breakfast', 'lunch', 'dinner', 'mood', 'sleep_hours', 'stress_level', 'physical_activity', 'cramp_intensity', 'pcos', 'thyroid', 'notes', 'custom_tags')
+INSERT_LOG_SQL = f"INSERT INTO logs ({', '.join(LOG_INSERT_COLUMNS)}) VALUES ({', '.join('?' * len(LOG_INSERT_COLUMNS))})"
+
+# UI log keys, as add_log takes them, for LOG_INSERT_COLUMNS[1:]; also the bulk import/export field names
+LOG_FIELDS = ('Date', 'Breakfast', 'Lunch', 'Dinner', 'Mood', 'Sleep Hours', 'Stress Level', 'Physical Activity', 'Cramp Intensity', 'PCOS', 'Thyroid', 'Notes', 'Custom Tags')
+
+def _log_values(user_id, log_data):
+    """Maps a UI log dict (keys like 'Sleep Hours') to a row tuple in LOG_INSERT_COLUMNS order."""
+    return (
         user_id, log_data.get('Date'), log_data.get('Breakfast'), log_data.get('Lunch'),
         log_data.get('Dinner'), log_data.get('Mood'), log_data.get('Sleep Hours'),
         log_data.get('Stress Level'), log_data.get('Physical Activity'),
         log_data.get('Cramp Intensity'), int(log_data.get('PCOS', 0)), int(log_data.get('Thyroid', 0)),
         log_data.get('Notes'), log_data.get('Custom Tags')
-    ))
-    conn.commit()
-    conn.close()
+    )
+
+def _insert_log(conn, user_id, log_data):
+    values = _log_values(user_id, log_data)
+    log_id = conn.execute(INSERT_LOG_SQL, values).lastrowid
+    _update_rollups(conn, [dict(zip(LOG_INSERT_COLUMNS, values))])
+    _insert_log_tags(conn, [(log_id, user_id, log_data.get('Custom Tags'))])
 
+def add_log(user_id, log_data):
+    """Adds a daily log for a specific user, including notes and tags. Queued when write-behind is on."""
+    _write(_insert_log, user_id, dict(log_data))
+    _notify('log', user_id)
+
+@_after_pending_writes
 def get_logs(user_id):
     """Retrieves all logs for a specific user as a pandas DataFrame."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    df = pd.read_sql_query("SELECT * FROM logs WHERE user_id = ?", conn, params=(user_id,))
-    conn.close()
+    import pandas as pd
+    return pd.read_sql_query("SELECT * FROM logs WHERE user_id = ?", get_connection(), params=(user_id,))
+
+# Column types returned by query_logs. REAL columns are NULLed in SQL when they hold
+# non-numeric text (e.g. an empty entry box), and dates come back parsed.
+LOG_COLUMN_TYPES = {
+    'id': 'integer', 'user_id': 'integer', 'date': 'date',
+    'breakfast': 'text', 'lunch': 'text', 'dinner': 'text', 'mood': 'text',
+    'sleep_hours': 'real', 'stress_level': 'real', 'physical_activity': 'text',
+    'cramp_intensity': 'real', 'pcos': 'integer', 'thyroid': 'integer',
+    'notes': 'text', 'custom_tags': 'text',
+}
+
+def _date_param(value):
+    return value if value is None or isinstance(value, str) else value.strftime('%Y-%m-%d')
+
+@_after_pending_writes
+def query_logs(user_id, columns=None, start_date=None, end_date=None, after_id=None):
+    """
+    Retrieves a user's logs ordered by date, reading only the requested columns and
+    only rows with start_date <= date <= end_date (both optional, inclusive).
+    Dates may be 'YYYY-MM-DD' strings, dates or datetimes. `after_id` keeps only logs
+    saved after that one (ids increase with each save).
+    """
+    import pandas as pd
+    columns = list(columns or LOG_COLUMN_TYPES)
+    unknown = [c for c in columns if c not in LOG_COLUMN_TYPES]
+    if unknown:
+        raise ValueError(f"Unknown log columns: {', '.join(unknown)}")
+    select = []
+    for column in columns:
+        if LOG_COLUMN_TYPES[column] == 'real':
+            select.append(f"CASE WHEN typeof({column}) IN ('real', 'integer') THEN {column} END AS {column}")
+        else:
+            select.append(column)
+    sql = f"SELECT {', '.join(select)} FROM logs WHERE user_id = ?"
+    params = [user_id]
+    if start_date is not None:
+        sql += " AND date >= ?"; params.append(_date_param(start_date))
+    if end_date is not None:
+        sql += " AND date <= ?"; params.append(_date_param(end_date))
+    if after_id is not None:
+        sql += " AND id > ?"; params.append(after_id)
+    sql += " ORDER BY date, id"
+    df = pd.read_sql_query(sql, get_connection(), params=params)
+    for column in columns:
+        kind = LOG_COLUMN_TYPES[column]
+        if kind == 'real':
+            df[column] = df[column].astype('float64')
+        elif kind == 'date':
+            df[column] = pd.to_datetime(df[column], format='%Y-%m-%d', errors='coerce')
     return df
 
-def add_reminder(user_id, date, message):
-    """Adds a new reminder to the database."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO reminders (user_id, reminder_date, message) VALUES (?, ?, ?)", (user_id, date, message))
-    conn.commit()
-    conn.close()
+@_after_pending_writes
+def count_logs(user_id, through_id=None):
+    """The number of logs a user has, or has with id <= through_id."""
+    if through_id is None:
+        return get_connection().execute("SELECT COUNT(*) FROM logs WHERE user_id = ?", (user_id,)).fetchone()[0]
+    return get_connection().execute("SELECT COUNT(*) FROM logs WHERE user_id = ? AND id <= ?", (user_id, through_id)).fetchone()[0]
+
+@_after_pending_writes
+def get_log_version(user_id):
+    """A counter that changes whenever one of the user's existing logs is edited or deleted (inserts don't move it)."""
+    row = get_connection().execute("SELECT version FROM log_versions WHERE user_id = ?", (user_id,)).fetchone()
+    return row[0] if row else 0
+
+# --- Rollups ---
+# Per-user daily and weekly aggregates (sums and counts, so averages can be combined
+# across periods) plus mood and tag counts. add_log keeps them current, so summaries
+# read one row per period instead of every raw log.
+ROLLUP_PERIODS = {
+    'day': lambda d: d,
+    'week': lambda d: d - timedelta(days=d.weekday()), # Weeks start on Monday
+}
+
+def _as_number(value):
+    """Mirrors SQLite REAL affinity: numbers and numeric text count, anything else is NULL."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def split_tags(custom_tags):
+    """Splits a comma-joined custom_tags value into its non-empty, stripped tags."""
+    return [tag.strip() for tag in (custom_tags or '').split(',') if tag.strip()]
+
+def _update_rollups(conn, rows):
+    """Adds logs (dicts keyed by column name) to the rollup tables. Runs inside the caller's transaction."""
+    stats, moods, tags = {}, {}, {}
+    for row in rows:
+        try:
+            day = date.fromisoformat(str(row['date']))
+        except ValueError:
+            continue
+        values = [_as_number(row.get(c)) for c in ('sleep_hours', 'stress_level', 'cramp_intensity')]
+        mood, row_tags = row.get('mood'), split_tags(row.get('custom_tags'))
+        for period, period_start in ROLLUP_PERIODS.items():
+            key = (row['user_id'], period, period_start(day).isoformat())
+            totals = stats.setdefault(key, [0, 0.0, 0, 0.0, 0, 0.0, 0])
+            totals[0] += 1
+            for i, value in enumerate(values):
+                if value is not None:
+                    totals[1 + 2 * i] += value; totals[2 + 2 * i] += 1
+            if mood is not None:
+                moods[key + (mood,)] = moods.get(key + (mood,), 0) + 1
+            for tag in dict.fromkeys(row_tags): # Once per log, like log_tags
+                tags[key + (tag,)] = tags.get(key + (tag,), 0) + 1
+    conn.executemany('''
+        INSERT INTO log_rollups (user_id, period, period_start, log_count, sleep_sum, sleep_count, stress_sum, stress_count, cramp_sum, cramp_count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, period, period_start) DO UPDATE SET
+            log_count = log_count + excluded.log_count,
+            sleep_sum = sleep_sum + excluded.sleep_sum, sleep_count = sleep_count + excluded.sleep_count,
+            stress_sum = stress_sum + excluded.stress_sum, stress_count = stress_count + excluded.stress_count,
+            cramp_sum = cramp_sum + excluded.cramp_sum, cramp_count = cramp_count + excluded.cramp_count
+    ''', [key + tuple(totals) for key, totals in stats.items()])
+    conn.executemany('''
+        INSERT INTO mood_rollups (user_id, period, period_start, mood, count) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, period, period_start, mood) DO UPDATE SET count = count + excluded.count
+    ''', [key + (count,) for key, count in moods.items()])
+    conn.executemany('''
+        INSERT INTO tag_rollups (user_id, period, period_start, tag, count) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, period, period_start, tag) DO UPDATE SET count = count + excluded.count
+    ''', [key + (count,) for key, count in tags.items()])
+
+# Period start of a 'YYYY-MM-DD' `day` column in SQL, matching ROLLUP_PERIODS
+ROLLUP_PERIOD_SQL = {
+    'day': "day",
+    'week': "date(day, 'weekday 0', '-6 days')", # The Monday on or before the day
+}
+
+def _update_rollups_after(conn, after_id):
+    """
+    Set-based _update_rollups for every log with id > after_id, for bulk writes. Tag
+    counts come from log_tags, so those logs' tags must be inserted first.
+    """
+    numeric = {c: f"CASE WHEN typeof(l.{c}) IN ('real', 'integer') THEN l.{c} END" for c in ('sleep_hours', 'stress_level', 'cramp_intensity')}
+    valid = "date(l.date) = l.date" # Skips unparseable dates, as _update_rollups does
+    # Aggregate the new logs per day once; every period is then summed from the days
+    day_tables = {
+        'new_log_days': f'''
+            SELECT l.user_id, l.date AS day, COUNT(*) AS log_count,
+                   TOTAL({numeric['sleep_hours']}) AS sleep_sum, COUNT({numeric['sleep_hours']}) AS sleep_count,
+                   TOTAL({numeric['stress_level']}) AS stress_sum, COUNT({numeric['stress_level']}) AS stress_count,
+                   TOTAL({numeric['cramp_intensity']}) AS cramp_sum, COUNT({numeric['cramp_intensity']}) AS cramp_count
+            FROM logs l WHERE l.id > ? AND {valid} GROUP BY l.user_id, l.date''',
+        'new_mood_days': f"SELECT l.user_id, l.date AS day, l.mood, COUNT(*) AS count FROM logs l WHERE l.id > ? AND {valid} AND l.mood IS NOT NULL GROUP BY l.user_id, l.date, l.mood",
+        'new_tag_days': f"SELECT l.user_id, l.date AS day, t.tag, COUNT(*) AS count FROM log_tags t JOIN logs l ON l.id = t.log_id WHERE t.log_id > ? AND {valid} GROUP BY l.user_id, l.date, t.tag",
+    }
+    for table, select in day_tables.items():
+        conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        conn.execute(f"CREATE TEMP TABLE {table} AS {select}", (after_id,))
+    for period, period_start in ROLLUP_PERIOD_SQL.items():
+        conn.execute(f'''
+            INSERT INTO log_rollups (user_id, period, period_start, log_count, sleep_sum, sleep_count, stress_sum, stress_count, cramp_sum, cramp_count)
+            SELECT user_id, ?, {period_start} AS start, SUM(log_count), SUM(sleep_sum), SUM(sleep_count), SUM(stress_sum), SUM(stress_count), SUM(cramp_sum), SUM(cramp_count)
+            FROM temp.new_log_days WHERE true GROUP BY user_id, start
+            ON CONFLICT (user_id, period, period_start) DO UPDATE SET
+                log_count = log_count + excluded.log_count,
+                sleep_sum = sleep_sum + excluded.sleep_sum, sleep_count = sleep_count + excluded.sleep_count,
+                stress_sum = stress_sum + excluded.stress_sum, stress_count = stress_count + excluded.stress_count,
+                cramp_sum = cramp_sum + excluded.cramp_sum, cramp_count = cramp_count + excluded.cramp_count
+        ''', (period,))
+        for table, rollup, column in (('new_mood_days', 'mood_rollups', 'mood'), ('new_tag_days', 'tag_rollups', 'tag')):
+            conn.execute(f'''
+                INSERT INTO {rollup} (user_id, period, period_start, {column}, count)
+                SELECT user_id, ?, {period_start} AS start, {column}, SUM(count) FROM temp.{table} WHERE true GROUP BY user_id, start, {column}
+                ON CONFLICT (user_id, period, period_start, {column}) DO UPDATE SET count = count + excluded.count
+            ''', (period,))
+    for table in day_tables:
+        conn.execute(f"DROP TABLE temp.{table}")
+
+def _rebuild_rollups(conn, user_id=None, batch_size=5000):
+    """Regenerates the rollups from raw logs (for one user or everyone). Runs inside the caller's transaction."""
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+    for table in ('log_rollups', 'mood_rollups', 'tag_rollups'):
+        conn.execute(f"DELETE FROM {table} {where}", params)
+    columns = ('user_id', 'date', 'mood', 'sleep_hours', 'stress_level', 'cramp_intensity', 'custom_tags')
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM logs {where}", params)
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        _update_rollups(conn, [dict(zip(columns, row)) for row in batch])
+
+@_after_pending_writes
+def rebuild_rollups(user_id=None):
+    """Regenerates the daily/weekly rollups from the raw logs table."""
+    conn = get_connection()
+    with conn:
+        _rebuild_rollups(conn, user_id)
+
+@_after_pending_writes
+def get_rollups(user_id, period='day', start_date=None, end_date=None):
+    """Returns a user's rollup rows for `period` ('day' or 'week') as a DataFrame, one row per period."""
+    import pandas as pd
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"Unknown rollup period: {period}")
+    sql = "SELECT * FROM log_rollups WHERE user_id = ? AND period = ?"
+    params = [user_id, period]
+    if start_date is not None:
+        sql += " AND period_start >= ?"; params.append(_date_param(start_date))
+    if end_date is not None:
+        sql += " AND period_start <= ?"; params.append(_date_param(end_date))
+    return pd.read_sql_query(sql + " ORDER BY period_start", get_connection(), params=params)
+
+@_after_pending_writes
+def get_log_summary(user_id, start_date, end_date=None):
+    """
+    Summarizes a user's logs between two dates (inclusive) from the daily rollups:
+    log count, average sleep/stress/cramps and mood and tag counts (most common first).
+    """
+    conn = get_connection()
+    where = "WHERE user_id = ? AND period = 'day' AND period_start >= ?"
+    params = [user_id, _date_param(start_date)]
+    if end_date is not None:
+        where += " AND period_start <= ?"; params.append(_date_param(end_date))
+    totals = conn.execute(f"SELECT SUM(log_count), SUM(sleep_sum), SUM(sleep_count), SUM(stress_sum), SUM(stress_count), SUM(cramp_sum), SUM(cramp_count) FROM log_rollups {where}", params).fetchone()
+    log_count = totals[0] or 0
+    average = lambda total, count: total / count if count else float('nan')
+    moods = conn.execute(f"SELECT mood, SUM(count) AS n FROM mood_rollups {where} GROUP BY mood ORDER BY n DESC, mood", params).fetchall()
+    tags = conn.execute(f"SELECT tag, SUM(count) AS n FROM tag_rollups {where} GROUP BY tag ORDER BY n DESC, tag", params).fetchall()
+    return {
+        'log_count': log_count,
+        'avg_sleep': average(totals[1], totals[2]),
+        'avg_stress': average(totals[3], totals[4]),
+        'avg_cramps': average(totals[5], totals[6]),
+        'mood_counts': dict(moods),
+        'tag_counts': dict(tags),
+    }
+
+# --- Tags ---
+# log_tags holds one row per (log, tag), indexed on (user_id, tag), so tag analytics
+# are indexed SQL rather than re-splitting custom_tags strings.
+
+def _insert_log_tags(conn, rows):
+    """Inserts tags for (log_id, user_id, custom_tags) rows. Runs inside the caller's transaction."""
+    conn.executemany(
+        "INSERT OR IGNORE INTO log_tags (log_id, user_id, tag) VALUES (?, ?, ?)",
+        [(log_id, user_id, tag) for log_id, user_id, custom_tags in rows for tag in split_tags(custom_tags)])
+
+def _date_filter(start_date, end_date, column="l.date"):
+    sql, params = "", []
+    if start_date is not None:
+        sql += f" AND {column} >= ?"; params.append(_date_param(start_date))
+    if end_date is not None:
+        sql += f" AND {column} <= ?"; params.append(_date_param(end_date))
+    return sql, params
+
+@_after_pending_writes
+def get_tagged_days(user_id, tag, start_date=None, end_date=None):
+    """Returns the distinct dates (oldest first) on which the user logged `tag`."""
+    date_sql, date_params = _date_filter(start_date, end_date)
+    rows = get_connection().execute(f'''
+        SELECT DISTINCT l.date FROM log_tags t JOIN logs l ON l.id = t.log_id
+        WHERE t.user_id = ? AND t.tag = ?{date_sql} ORDER BY l.date
+    ''', [user_id, tag] + date_params).fetchall()
+    return [r[0] for r in rows]
+
+@_after_pending_writes
+def get_top_tags(user_id, n=10, start_date=None, end_date=None):
+    """Returns the user's `n` most used tags as (tag, count) pairs, most common first."""
+    conn = get_connection()
+    if start_date is None and end_date is None:
+        rows = conn.execute("SELECT tag, COUNT(*) AS n FROM log_tags WHERE user_id = ? GROUP BY tag ORDER BY n DESC, tag LIMIT ?", (user_id, n))
+    else:
+        date_sql, date_params = _date_filter(start_date, end_date)
+        rows = conn.execute(f'''
+            SELECT t.tag, COUNT(*) AS n FROM log_tags t JOIN logs l ON l.id = t.log_id
+            WHERE t.user_id = ?{date_sql} GROUP BY t.tag ORDER BY n DESC, t.tag LIMIT ?
+        ''', [user_id] + date_params + [n])
+    return rows.fetchall()
+
+@_after_pending_writes
+def get_tag_cramp_cooccurrence(user_id, tag, high_cramp=7, start_date=None, end_date=None):
+    """
+    Compares how often cramp intensity is high (>= high_cramp) on logs tagged `tag`
+    versus logs without it. Only logs with a numeric cramp intensity are counted.
+    """
+    date_sql, date_params = _date_filter(start_date, end_date)
+    row = get_connection().execute(f'''
+        SELECT COUNT(*),
+               COALESCE(SUM(l.cramp_intensity >= ?), 0),
+               COALESCE(SUM(t.log_id IS NOT NULL), 0),
+               COALESCE(SUM(t.log_id IS NOT NULL AND l.cramp_intensity >= ?), 0)
+        FROM logs l LEFT JOIN log_tags t ON t.log_id = l.id AND t.user_id = ? AND t.tag = ?
+        WHERE l.user_id = ? AND typeof(l.cramp_intensity) IN ('real', 'integer'){date_sql}
+    ''', [high_cramp, high_cramp, user_id, tag, user_id] + date_params).fetchone()
+    logs, high, tagged, tagged_high = row
+    untagged, untagged_high = logs - tagged, high - tagged_high
+    return {
+        'tagged_logs': tagged,
+        'tagged_high_cramp': tagged_high,
+        'untagged_logs': untagged,
+        'untagged_high_cramp': untagged_high,
+        'high_cramp_rate_tagged': tagged_high / tagged if tagged else float('nan'),
+        'high_cramp_rate_untagged': untagged_high / untagged if untagged else float('nan'),
+    }
+
+# --- Bulk Import / Export ---
+# Logs move in and out as CSV, JSON Lines or (with pyarrow installed) Parquet files
+# whose fields are LOG_FIELDS. Imports stream the file in chunks and insert each
+# chunk with executemany, all in one transaction: one commit for the whole file, and
+# a failed import leaves nothing behind. Exports stream rows from a cursor.
 
+BULK_CHUNK_SIZE = 50_000
+BULK_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+_TRUE_STRINGS = {'1', 'true', 'yes', 'y'}
+
+def _bulk_format(path, fmt):
+    fmt = fmt or BULK_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in BULK_READERS:
+        raise ValueError(f"Unknown log file format for {path}; use one of {sorted(BULK_READERS)}")
+    return fmt
+
+def _import_record(record):
+    """Normalizes a record read from a file: blanks become NULL, PCOS/Thyroid accept 1/0 or true/false."""
+    record = {k: (None if v == '' else v) for k, v in record.items()}
+    for flag in ('PCOS', 'Thyroid'):
+        value = record.get(flag)
+        record[flag] = int(str(value).strip().lower() in _TRUE_STRINGS) if value is not None and not isinstance(value, (bool, int, float)) else int(value or 0)
+    return record
+
+def _chunks(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _read_csv(path, chunk_size):
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = csv.reader(f)
+        header = next(rows, [])
+        yield from _chunks((dict(zip(header, row)) for row in rows), chunk_size)
+
+def _read_jsonl(path, chunk_size):
+    with open(path, encoding='utf-8') as f:
+        yield from _chunks((json.loads(line) for line in f if line.strip()), chunk_size)
+
+def _read_parquet(path, chunk_size):
+    import pyarrow.parquet as pq # Optional dependency, only needed for Parquet files
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+def _write_csv(path, chunks):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(LOG_FIELDS)
+        for rows in chunks:
+            writer.writerows(rows)
+            count += len(rows)
+    return count
+
+def _write_jsonl(path, chunks):
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for rows in chunks:
+            f.writelines(json.dumps(dict(zip(LOG_FIELDS, row)), ensure_ascii=False) + '\n' for row in rows)
+            count += len(rows)
+    return count
+
+def _write_parquet(path, chunks):
+    import pyarrow as pa # Optional dependency, only needed for Parquet files
+    import pyarrow.parquet as pq
+    numeric = {'Sleep Hours', 'Stress Level', 'Cramp Intensity'}
+    types = {field: pa.float64() if field in numeric else pa.int64() if field in ('PCOS', 'Thyroid') else pa.string() for field in LOG_FIELDS}
+    schema = pa.schema([(field, types[field]) for field in LOG_FIELDS])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            # Parquet columns are typed: non-numeric text in numeric fields is written as null, other values as text
+            arrays = [pa.array([_as_number(v) for v in values] if field in numeric else [None if v is None else str(v) for v in values] if types[field] == pa.string() else values, type=types[field])
+                      for field, values in zip(LOG_FIELDS, columns)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+BULK_READERS = {'csv': _read_csv, 'jsonl': _read_jsonl, 'parquet': _read_parquet}
+BULK_WRITERS = {'csv': _write_csv, 'jsonl': _write_jsonl, 'parquet': _write_parquet}
+
+@_after_pending_writes
+def import_logs(user_id, path, fmt=None, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Imports every log in a CSV/JSONL/Parquet file for `user_id`, keeping rollups and tags
+    current. All or nothing: any error rolls the whole import back. Returns the row count.
+    """
+    reader = BULK_READERS[_bulk_format(path, fmt)]
+    conn = get_connection()
+    count = 0
+    # IMMEDIATE takes the write lock up front, so every id above the current maximum is this import's
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+        for records in reader(path, chunk_size):
+            chunk_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+            conn.executemany(INSERT_LOG_SQL, [_log_values(user_id, _import_record(record)) for record in records])
+            _insert_log_tags(conn, conn.execute("SELECT id, user_id, custom_tags FROM logs WHERE id > ? AND custom_tags IS NOT NULL", (chunk_id,)))
+            count += len(records)
+        _update_rollups_after(conn, first_id)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    _notify('log', user_id)
+    return count
+
+@_after_pending_writes
+def export_logs(user_id, path, fmt=None, start_date=None, end_date=None, chunk_size=BULK_CHUNK_SIZE):
+    """Writes a user's logs (optionally a date range) to a CSV/JSONL/Parquet file in date order. Returns the row count."""
+    writer = BULK_WRITERS[_bulk_format(path, fmt)]
+    date_sql, params = _date_filter(start_date, end_date, column="date")
+    cursor = get_connection().execute(
+        f"SELECT {', '.join(LOG_INSERT_COLUMNS[1:])} FROM logs WHERE user_id = ?{date_sql} ORDER BY date, id", (user_id, *params))
+    return writer(path, iter(lambda: cursor.fetchmany(chunk_size), []))
+
+# --- Forecasting Profiles ---
+
+def get_user_profile(user_id):
+    """The user's saved (age, bmi), or None if they haven't opted in to cohort forecasts."""
+    return get_connection().execute("SELECT age, bmi FROM user_profiles WHERE user_id = ?", (user_id,)).fetchone()
+
+def delete_user_profile(user_id):
+    """Forgets a user's age and BMI, taking them out of the nightly cohort forecast."""
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM user_profiles WHERE user_id = ?", (user_id,))
+        conn.execute("DELETE FROM cohort_forecasts WHERE user_id = ?", (user_id,))
+
+def save_user_profile(user_id, age, bmi):
+    """Remembers the age and BMI a user last forecast with, for batch/nightly forecasts. Only call it with their consent."""
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO user_profiles (user_id, age, bmi, updated_at) VALUES (?, ?, ?, datetime('now'))
+            ON CONFLICT (user_id) DO UPDATE SET age = excluded.age, bmi = excluded.bmi, updated_at = excluded.updated_at
+        ''', (user_id, age, bmi))
+
+@_after_pending_writes
+def get_cohort_recent_averages(start_date, end_date=None):
+    """
+    One row per profiled user with logs in the range: user_id, age, bmi and their average
+    stress_level and sleep_hours, read from the daily rollups.
+    """
+    import pandas as pd
+    date_sql, params = _date_filter(start_date, end_date, column="r.period_start")
+    return pd.read_sql_query(f'''
+        SELECT p.user_id, p.age, p.bmi,
+               SUM(r.stress_sum) / SUM(r.stress_count) AS stress_level,
+               SUM(r.sleep_sum) / SUM(r.sleep_count) AS sleep_hours
+        FROM user_profiles p JOIN log_rollups r ON r.user_id = p.user_id AND r.period = 'day'
+        WHERE p.age IS NOT NULL AND p.bmi IS NOT NULL{date_sql}
+        GROUP BY p.user_id
+        HAVING SUM(r.stress_count) > 0 AND SUM(r.sleep_count) > 0
+        ORDER BY p.user_id
+    ''', get_connection(), params=params)
+
+def save_cohort_forecasts(forecasts):
+    """Stores a forecast_cohort DataFrame, replacing earlier forecasts for the same user and week."""
+    columns = ['user_id', 'week_start', 'mood', 'mood_confidence', 'cramp_high', 'cramp_probability']
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO cohort_forecasts ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            forecasts[columns].astype(object).itertuples(index=False, name=None))
+
+# --- Cycles ---
+# Each logged period start adds the gap since the previous one to running sums
+# (count, sum, sum of squares), so the cycle forecaster updates in O(1) per cycle.
+
+CYCLE_LENGTH_RANGE = (15, 60) # Gaps outside this range are treated as missed logs, not cycles
+
+def _cycle_stats_row(conn, user_id):
+    row = conn.execute("SELECT n_cycles, length_sum, length_sq_sum, last_start FROM cycle_stats WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        return None
+    return {'n_cycles': row[0], 'length_sum': row[1], 'length_sq_sum': row[2], 'last_start': date.fromisoformat(row[3])}
+
+def _rebuild_cycle_stats(conn, user_id):
+    """Recomputes a user's cycle sums from all of their period starts."""
+    starts = [date.fromisoformat(d) for (d,) in conn.execute(
+        "SELECT start_date FROM period_starts WHERE user_id = ? ORDER BY start_date", (user_id,))]
+    lengths = [(b - a).days for a, b in zip(starts, starts[1:])]
+    lengths = [n for n in lengths if CYCLE_LENGTH_RANGE[0] <= n <= CYCLE_LENGTH_RANGE[1]]
+    conn.execute('''
+        INSERT OR REPLACE INTO cycle_stats (user_id, n_cycles, length_sum, length_sq_sum, last_start) VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, len(lengths), sum(lengths), sum(n * n for n in lengths), starts[-1].isoformat()))
+
+def record_period_start(user_id, start_date):
+    """
+    Logs a period start date and returns the user's updated cycle stats. A start after the
+    latest one extends the running sums; an earlier (backfilled) one rebuilds them.
+    """
+    start_date = _date_param(start_date)
+    conn = get_connection()
+    with conn:
+        if conn.execute("INSERT OR IGNORE INTO period_starts (user_id, start_date) VALUES (?, ?)", (user_id, start_date)).rowcount:
+            stats = _cycle_stats_row(conn, user_id)
+            new_start = date.fromisoformat(start_date)
+            if stats is None:
+                conn.execute("INSERT INTO cycle_stats (user_id, last_start) VALUES (?, ?)", (user_id, start_date))
+            elif new_start > stats['last_start']:
+                length = (new_start - stats['last_start']).days
+                counted = CYCLE_LENGTH_RANGE[0] <= length <= CYCLE_LENGTH_RANGE[1]
+                conn.execute('''
+                    UPDATE cycle_stats SET n_cycles = n_cycles + ?, length_sum = length_sum + ?, length_sq_sum = length_sq_sum + ?, last_start = ?
+                    WHERE user_id = ?
+                ''', (int(counted), length * counted, length * length * counted, start_date, user_id))
+            else:
+                _rebuild_cycle_stats(conn, user_id)
+        stats = _cycle_stats_row(conn, user_id)
+    _notify('period_start', user_id, start_date)
+    return stats
+
+def get_cycle_stats(user_id):
+    """A user's cycle sums: n_cycles, length_sum, length_sq_sum and last_start (a date), or None before any start is logged."""
+    return _cycle_stats_row(get_connection(), user_id)
+
+def _insert_reminder(conn, user_id, date, message, recurrence):
+    conn.execute("INSERT INTO reminders (user_id, reminder_date, message, recurrence) VALUES (?, ?, ?, ?)", (user_id, date, message, recurrence))
+
+def add_reminder(user_id, date, message, recurrence=None):
+    """
+    Adds a new reminder to the database. Queued when write-behind is on. `recurrence` is None
+    for a one-off reminder, 'days:N' to repeat every N days from `date`, or 'cycle_day:N' for
+    day N of every cycle (see reminder_scheduler).
+    """
+    _write(_insert_reminder, user_id, date, message, recurrence)
+    _notify('reminder', user_id, date, message, recurrence)
+
+@_after_pending_writes
 def get_reminders_for_date(user_id, date):
     """Gets all reminders for a specific user and date."""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT message FROM reminders WHERE user_id = ? AND reminder_date = ?", (user_id, date))
-    reminders = cursor.fetchall()
-    conn.close()
-    return [r[0] for r in reminders]
\ No newline at end of file
+    reminders = get_connection().execute("SELECT message FROM reminders WHERE user_id = ? AND reminder_date = ?", (user_id, date)).fetchall()
+    return [r[0] for r in reminders]
+
+@_after_pending_writes
+def get_upcoming_reminders(user_id, start_date):
+    """A user's reminders dated on or after `start_date`, plus every recurring one, as dicts ordered by date."""
+    start_date = _date_param(start_date)
+    # Two range scans on idx_reminders_user_date rather than one OR the planner can't index
+    rows = get_connection().execute('''
+        SELECT reminder_date, message, recurrence FROM reminders WHERE user_id = ? AND reminder_date >= ?
+        UNION ALL
+        SELECT reminder_date, message, recurrence FROM reminders WHERE user_id = ? AND reminder_date < ? AND recurrence IS NOT NULL
+        ORDER BY reminder_date
+    ''', (user_id, start_date, user_id, start_date)).fetchall()
+    return [{'reminder_date': d, 'message': m, 'recurrence': r} for d, m, r in rows]
+
+if __name__ == "__main__":
+    # Maintenance commands, e.g. `python database.py rebuild-rollups`
+    if sys.argv[1:] == ["rebuild-rollups"]:
+        init_db()
+        rebuild_rollups()
+        print("Rollups rebuilt.")
+    elif len(sys.argv) == 4 and sys.argv[1] in ("import-logs", "export-logs"):
+        init_db()
+        command, user_id, path = sys.argv[1], int(sys.argv[2]), sys.argv[3]
+        if command == "import-logs":
+            print(f"Imported {import_logs(user_id, path)} logs.")
+        else:
+            print(f"Exported {export_logs(user_id, path)} logs.")
+    else:
+        print("Usage: python database.py rebuild-rollups | import-logs <user_id> <file> | export-logs <user_id> <file>")
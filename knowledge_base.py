@@ -0,0 +1,178 @@
+"""
+Local retrieval over the bundled menstrual-health Q&A pairs (train.csv / test.csv).
+
+Questions are embedded as character n-gram TF-IDF vectors once and cached in the
+model store. A chat message that closely matches a known question is answered
+offline from the index; anything else falls back to the AI companion. A close match
+must also ask the same thing (see is_confident_match): a wrong answer given with
+confidence is worse for a health question than a round trip to the network.
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+
+import datasets
+from response_cache import meaning_tokens, normalize_query
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_STORE_DIR = os.path.join(SCRIPT_DIR, 'model_store')
+INDEX_VERSION = 1
+
+QA_FILES = ('train.csv', 'test.csv')
+QUESTION_COLUMN = 'instruction (string)'
+ANSWER_COLUMN = 'output (string)'
+
+VECTORIZER_PARAMS = {'analyzer': 'char_wb', 'ngram_range': (3, 5), 'sublinear_tf': True}
+MIN_CONFIDENCE = 0.75 # Cosine similarity needed to answer locally (see benchmarks/bench_knowledge_base.py)
+CONTENT_STEM_LENGTH = 5 # Content words compare on their first letters, so "period" matches "periods"
+
+def normalize_question(text):
+    """Lowercases, collapses whitespace and drops trailing punctuation, for exact-match lookups."""
+    return re.sub(r'\s+', ' ', text.lower()).strip().rstrip('?!. ')
+
+def content_words(text):
+    """Stems of the words that carry a question's topic (no stop words, numbers or short words)."""
+    return {w[:CONTENT_STEM_LENGTH] for w in normalize_query(text).split() if len(w) > 2 and not w.isdigit() and w not in ENGLISH_STOP_WORDS}
+
+def is_confident_match(query, matched_question, similarity, min_confidence=MIN_CONFIDENCE):
+    """
+    Whether a search result may answer `query`: similar enough, with the same numbers and
+    negations, and every content word of the query in the matched question ("light periods"
+    must not get the answer about "irregular periods").
+    """
+    if similarity < min_confidence:
+        return False
+    query_key, matched_key = normalize_query(query), normalize_query(matched_question)
+    return meaning_tokens(query_key) == meaning_tokens(matched_key) and content_words(query) <= content_words(matched_question)
+
+class QAIndex:
+    """TF-IDF index over Q&A pairs with a dictionary fast path for exact questions."""
+    def __init__(self, questions, answers):
+        self.questions = list(questions)
+        self.answers = list(answers)
+        vectorizer = TfidfVectorizer(dtype=np.float32, **VECTORIZER_PARAMS)
+        matrix = vectorizer.fit_transform(self.questions)
+        self.vocabulary = vectorizer.vocabulary_
+        self.idf = vectorizer.idf_.astype(np.float32)
+        # Term-major (CSR of the transpose): each n-gram's postings are one contiguous slice
+        postings = matrix.T.tocsr()
+        self.indptr, self.doc_ids, self.weights = postings.indptr, postings.indices, postings.data
+        self.vectorizer = vectorizer
+        self._analyzer = vectorizer.build_analyzer()
+        self.exact = {}
+        for i, question in enumerate(self.questions):
+            self.exact.setdefault(normalize_question(question), i)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_analyzer']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._analyzer = self.vectorizer.build_analyzer()
+
+    @classmethod
+    def from_files(cls, paths):
+        frames = [datasets.load_path(path, [QUESTION_COLUMN, ANSWER_COLUMN]).dropna() for path in paths]
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(QUESTION_COLUMN)
+        return cls(df[QUESTION_COLUMN], df[ANSWER_COLUMN])
+
+    def scores(self, query):
+        """Cosine similarity of `query` to every stored question."""
+        counts = Counter(self._analyzer(query))
+        pairs = [(self.vocabulary[gram], n) for gram, n in counts.items() if gram in self.vocabulary]
+        if not pairs:
+            return np.zeros(len(self.questions))
+        terms = np.fromiter((p[0] for p in pairs), np.int64, len(pairs))
+        tf = np.fromiter((p[1] for p in pairs), np.float32, len(pairs))
+        query_weights = (1 + np.log(tf)) * self.idf[terms]
+        query_weights /= np.sqrt((query_weights * query_weights).sum())
+        # Gather every posting of the query's terms in one vectorized pass and sum per document
+        starts = self.indptr[terms]
+        lengths = self.indptr[terms + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.bincount(self.doc_ids[offsets], weights=self.weights[offsets] * np.repeat(query_weights, lengths), minlength=len(self.questions))
+
+    def search(self, query):
+        """Returns (answer, matched_question, similarity) for the closest stored question."""
+        i = self.exact.get(normalize_question(query))
+        if i is not None:
+            return self.answers[i], self.questions[i], 1.0
+        scores = self.scores(query)
+        i = int(scores.argmax())
+        return self.answers[i], self.questions[i], float(scores[i])
+
+def index_key(paths):
+    """Hash of the Q&A files' contents plus the index configuration."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    config = {'version': INDEX_VERSION, 'vectorizer': VECTORIZER_PARAMS, 'sklearn': sklearn.__version__}
+    digest.update(json.dumps(config, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+def load_index(paths=None, store_dir=None):
+    """Loads the cached index for `paths` (default: the bundled Q&A files), building and caching it if needed."""
+    paths = paths or [os.path.join(SCRIPT_DIR, name) for name in QA_FILES]
+    store_dir = store_dir or INDEX_STORE_DIR
+    path = os.path.join(store_dir, f"qa_index_{index_key(paths)}.pkl")
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        pass
+    index = QAIndex.from_files(paths)
+    try:
+        os.makedirs(store_dir, exist_ok=True)
+        for name in os.listdir(store_dir):
+            if name.startswith('qa_index_'):
+                os.remove(os.path.join(store_dir, name))
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"Could not cache Q&A index: {e}")
+    return index
+
+_index = None
+_index_ready = threading.Event()
+_index_lock = threading.Lock()
+
+def _load_shared_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = load_index()
+            except Exception as e:
+                print(f"Could not load Q&A index: {e}")
+            _index_ready.set()
+
+def preload():
+    """Starts loading the shared index on a background thread."""
+    if not _index_ready.is_set():
+        threading.Thread(target=_load_shared_index, name="qa-index-loader", daemon=True).start()
+
+def lookup(user_input, min_confidence=MIN_CONFIDENCE):
+    """
+    Returns a local answer when `user_input` closely matches a known question, else None.
+    Never blocks on loading: until the index is ready every message goes to the AI companion.
+    """
+    if not _index_ready.is_set():
+        preload()
+        return None
+    if _index is None:
+        return None
+    answer, matched_question, similarity = _index.search(user_input)
+    return answer if is_confident_match(user_input, matched_question, similarity, min_confidence) else None
@@ -1,8 +1,87 @@
 import pandas as pd
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
+from sklearn.preprocessing import LabelEncoder, StandardScaler
+from sklearn.linear_model import LogisticRegression
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.pipeline import make_pipeline
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+from sklearn.metrics import brier_score_loss, roc_auc_score
+import sklearn
 from tkinter import messagebox
 import os # Import the os module
+import hashlib
+import json
+import pickle
+import shutil
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import database as db
+import datasets
+import snapshot_cache
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# --- Model Artifact Store ---
+# Trained models are pickled into this folder, keyed by a hash of the training
+# data and configuration, so later logins can skip training entirely.
+MODEL_STORE_DIR = os.path.join(SCRIPT_DIR, 'model_store')
+MODEL_STORE_VERSION = 2
+
+MOOD_CRAMP_DATASET = 'Dataset_2.csv'
+MOOD_CRAMP_FEATURES = ['Age', 'BMI', 'Stress Level', 'Sleep Hours']
+MOOD_CRAMP_PARAMS = {'n_estimators': 100, 'random_state': 42}
+
+# Hyperparameters chosen by training_pipeline.py, committed alongside the code. They
+# override MOOD_CRAMP_PARAMS per model and become part of the artifact key. A model
+# store passed as store_dir reads its own training_config.json instead.
+TRAINING_CONFIG_NAME = 'training_config.json'
+TRAINING_CONFIG_PATH = os.path.join(SCRIPT_DIR, TRAINING_CONFIG_NAME)
+
+def training_config_path(store_dir=None):
+    return os.path.join(store_dir, TRAINING_CONFIG_NAME) if store_dir else TRAINING_CONFIG_PATH
+
+def load_training_config(store_dir=None):
+    """Returns {'mood': params, 'cramp': params} for the forests, from training_config_path(store_dir) if it exists."""
+    config = {'mood': dict(MOOD_CRAMP_PARAMS), 'cramp': dict(MOOD_CRAMP_PARAMS)}
+    try:
+        with open(training_config_path(store_dir), encoding='utf-8') as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return config
+    for target in config:
+        config[target].update(saved.get(target, {}))
+    return config
+
+def mood_cramp_training_data(file_path):
+    """Reads the training CSV and returns (X, y_mood_encoded, y_cramps, mood LabelEncoder, user ids)."""
+    # Typed and cached by the dataset registry, which also derives the Mood and Symptoms_Cramps labels
+    df = datasets.load_path(file_path, MOOD_CRAMP_FEATURES + ['Mood', 'Symptoms_Cramps', 'User ID'])
+
+    # Fit on a plain array so batch prediction can pass NumPy rows straight through
+    X = df[MOOD_CRAMP_FEATURES].to_numpy(dtype=np.float64)
+    le_mood = LabelEncoder()
+    y_mood_encoded = le_mood.fit_transform(df['Mood'].to_numpy(dtype=object))
+    return X, y_mood_encoded, df['Symptoms_Cramps'].to_numpy(dtype=np.int64), le_mood, df['User ID'].to_numpy()
+
+def _fit_forest(params, X, y):
+    # All cores while fitting; prediction goes back to one thread, which is faster for single rows
+    model = RandomForestClassifier(**params, n_jobs=-1)
+    model.fit(X, y)
+    return model.set_params(n_jobs=None)
+
+def _fit_mood_cramp_models(file_path, config=None):
+    """Fits the mood and cramp models on the given CSV, both at once. Raises on failure."""
+    X, y_mood_encoded, y_cramps, le_mood, _ = mood_cramp_training_data(file_path)
+    config = config or load_training_config()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        mood_future = pool.submit(_fit_forest, config['mood'], X, y_mood_encoded)
+        cramp_future = pool.submit(_fit_forest, config['cramp'], X, y_cramps)
+        mood_model, cramp_model = mood_future.result(), cramp_future.result()
+
+    return mood_model, cramp_model, {'mood': le_mood}
 
 def train_mood_cramp_models():
     """
@@ -10,39 +89,594 @@ def train_mood_cramp_models():
     Returns the trained models and the label encoder.
     """
     try:
-        # --- THE FIX ---
-        # Get the absolute path to the directory where this script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        # Join the directory path with the filename to create a full, reliable path
-        file_path = os.path.join(script_dir, 'Dataset_2.csv')
-        
-        # Read the CSV using the full path
-        df = pd.read_csv(file_path)
-        # --- END OF FIX ---
-        
-        df['Symptoms_Cramps'] = df['Symptoms'].apply(lambda x: 1 if 'Cramps' in x else 0)
-        symptom_to_mood = {'Headache': 'Stressed', 'Fatigue': 'Tired', 'Bloating': 'Neutral', 'Cramps': 'Sad', 'Mood Swings': 'Unstable'}
-        df['Mood'] = df['Symptoms'].map(symptom_to_mood).fillna('Neutral')
-        
-        features = ['Age', 'BMI', 'Stress Level', 'Sleep Hours']
-        X = df[features]
-        y_mood = df['Mood']
-        y_cramps = df['Symptoms_Cramps']
-        
-        le_mood = LabelEncoder()
-        y_mood_encoded = le_mood.fit_transform(y_mood)
-        
-        mood_model = RandomForestClassifier(n_estimators=100, random_state=42)
-        mood_model.fit(X, y_mood_encoded)
-        
-        cramp_model = RandomForestClassifier(n_estimators=100, random_state=42)
-        cramp_model.fit(X, y_cramps)
-        
-        return mood_model, cramp_model, {'mood': le_mood}
-        
-    except FileNotFoundError:
-        messagebox.showerror("Error", "Dataset_2.csv not found in the application folder. Forecasting will be disabled.")
+        # Join the script directory with the filename to create a full, reliable path
+        file_path = os.path.join(SCRIPT_DIR, MOOD_CRAMP_DATASET)
+        return _fit_mood_cramp_models(file_path)
+    except Exception as e:
+        show_model_error(e)
         return None, None, None
+
+def _store_key(file_path, config):
+    """A hash of the training CSV contents plus the configuration that affects the fitted result."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(json.dumps(dict(config, sklearn=sklearn.__version__), sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+def _write_artifact(path, artifact, prefix):
+    """Pickles `artifact` to `path` and removes the store's other `prefix`*.pkl artifacts."""
+    store_dir = os.path.dirname(path)
+    os.makedirs(store_dir, exist_ok=True)
+    # Write to a temp file first so a crash never leaves a half-written artifact behind
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    for name in os.listdir(store_dir):
+        if name.startswith(prefix) and name.endswith('.pkl') and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(store_dir, name))
+            except OSError:
+                pass
+
+def _read_artifact(path, key):
+    """Unpickles an artifact dict, or returns None if it is missing, unreadable or for another key."""
+    try:
+        with open(path, 'rb') as f:
+            artifact = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    return artifact if artifact.get('key') == key else None
+
+def model_artifact_key(file_path, config=None):
+    """Returns the store key for the mood/cramp models trained with `config` (default: load_training_config())."""
+    return _store_key(file_path, {
+        'store_version': MODEL_STORE_VERSION,
+        'features': MOOD_CRAMP_FEATURES,
+        'params': config or load_training_config(),
+    })
+
+def _artifact_path(key, store_dir):
+    return os.path.join(store_dir, f"mood_cramp_{key}.pkl")
+
+def load_model_artifact(key, store_dir=None):
+    """Loads stored models for `key`, or returns None if there is no usable artifact."""
+    artifact = _read_artifact(_artifact_path(key, store_dir or MODEL_STORE_DIR), key)
+    if artifact is None:
+        return None
+    return artifact['mood_model'], artifact['cramp_model'], artifact['label_encoders']
+
+def save_model_artifact(key, models, store_dir=None):
+    """Writes the models for `key` to the store and removes artifacts for older keys."""
+    mood_model, cramp_model, label_encoders = models
+    artifact = {'key': key, 'features': MOOD_CRAMP_FEATURES, 'mood_model': mood_model, 'cramp_model': cramp_model, 'label_encoders': label_encoders}
+    _write_artifact(_artifact_path(key, store_dir or MODEL_STORE_DIR), artifact, 'mood_cramp_')
+
+# --- Compact Forest Format ---
+# A fitted forest compiled into one flat node table shared by all its trees. Arrays are
+# stored as .npy files and memory-mapped on load, so worker processes share one copy
+# through the page cache, and prediction is a few vectorized NumPy gathers.
+
+class FlatForest:
+    """
+    Pure-NumPy evaluator for a compiled RandomForestClassifier. Exposes `classes_`,
+    `predict_proba` and `predict` with the same results as the sklearn model it came from.
+    """
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes', 'max_depth')
+    BLOCK_SIZE = 1 << 16 # (row, tree) pairs walked at once
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature, self.threshold = feature, threshold
+        self.left, self.right = left, right
+        self.value, self.roots = value, roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self._children = np.column_stack([right, left]).ravel().astype(np.intp) # 2 * node + went_left -> next node
+
+    @classmethod
+    def from_sklearn(cls, model):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            roots.append(offset)
+            # Leaves point back at themselves, so every row can take max_depth steps and stop at its leaf
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            value = tree.value[:, 0, :len(model.classes_)]
+            if not np.allclose(value.sum(axis=1), 1.0):
+                # Older scikit-learn stores class counts and normalizes them in predict_proba
+                normalizer = value.sum(axis=1)[:, None]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+        return cls(np.concatenate(features).astype(np.int32), np.concatenate(thresholds),
+                   np.concatenate(lefts).astype(np.int32), np.concatenate(rights).astype(np.int32),
+                   np.concatenate(values), np.array(roots, dtype=np.int32), np.asarray(model.classes_), max_depth)
+
+    def save(self, directory, prefix):
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{prefix}_{name}.npy"), np.asarray(getattr(self, 'classes_' if name == 'classes' else name)))
+
+    @classmethod
+    def load(cls, directory, prefix, mmap_mode='r'):
+        return cls(*(np.load(os.path.join(directory, f"{prefix}_{name}.npy"), mmap_mode=mmap_mode) for name in cls.ARRAYS))
+
+    def apply(self, X):
+        """
+        Yields the leaf index each row reaches, a block of trees at a time in tree order:
+        (n_rows, trees in block) arrays of at most BLOCK_SIZE entries, so memory stays flat
+        for large batches while a single row still walks every tree at once.
+        """
+        # sklearn compares float32 inputs against float64 thresholds; do exactly the same
+        X = np.asarray(X, dtype=np.float32).reshape(len(X), -1)
+        flat_X, n_rows = X.ravel(), len(X)
+        per_block = max(1, self.BLOCK_SIZE // max(n_rows, 1))
+        for first in range(0, len(self.roots), per_block):
+            roots = np.asarray(self.roots[first:first + per_block])
+            row_offsets = np.repeat(np.arange(n_rows, dtype=np.intp) * X.shape[1], len(roots))
+            leaves = np.tile(roots, n_rows).astype(np.intp)
+            active, node = np.arange(len(leaves)), leaves.copy() # (row, tree) pairs not yet at a leaf
+            for _ in range(self.max_depth + 1):
+                threshold = self.threshold[node]
+                internal = threshold != np.inf # Leaves have an infinite threshold
+                if not internal.all():
+                    leaves[active] = node
+                    active, node, threshold, row_offsets = active[internal], node[internal], threshold[internal], row_offsets[internal]
+                    if not len(active):
+                        break
+                go_left = flat_X[row_offsets + self.feature[node]] <= threshold
+                node = self._children[2 * node + go_left]
+            yield leaves.reshape(n_rows, len(roots))
+
+    def predict_proba(self, X):
+        proba = np.zeros((len(X), len(self.classes_)))
+        for leaves in self.apply(X):
+            # Added tree by tree in order, matching sklearn's accumulation bit for bit
+            for tree in range(leaves.shape[1]):
+                proba += self.value[leaves[:, tree]]
+        return proba / len(self.roots)
+
+    def predict(self, X):
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+def _flat_dir(key, store_dir):
+    return os.path.join(store_dir, f"mood_cramp_{key}_flat")
+
+def export_flat_models(models, directory):
+    """Compiles the mood and cramp forests (plus mood labels) into `directory` as .npy files."""
+    mood_model, cramp_model, label_encoders = models
+    os.makedirs(directory, exist_ok=True)
+    FlatForest.from_sklearn(mood_model).save(directory, 'mood')
+    FlatForest.from_sklearn(cramp_model).save(directory, 'cramp')
+    np.save(os.path.join(directory, 'mood_labels.npy'), label_encoders['mood'].classes_.astype(str))
+
+def load_flat_models(directory, mmap_mode='r'):
+    """Loads compiled models in the same (mood_model, cramp_model, label_encoders) shape as the sklearn ones."""
+    le_mood = LabelEncoder()
+    le_mood.classes_ = np.load(os.path.join(directory, 'mood_labels.npy'))
+    return FlatForest.load(directory, 'mood', mmap_mode), FlatForest.load(directory, 'cramp', mmap_mode), {'mood': le_mood}
+
+def _save_flat_artifact(key, models, store_dir):
+    directory = _flat_dir(key, store_dir)
+    tmp_dir = directory + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    export_flat_models(models, tmp_dir)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+    for name in os.listdir(store_dir):
+        if name.startswith('mood_cramp_') and name.endswith('_flat') and name != os.path.basename(directory):
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+def _load_mood_cramp_models(store_dir=None, compact=False):
+    """
+    Store-first load of the mood and cramp models. Raises on failure.
+    With compact=True the memory-mapped FlatForest versions are returned instead.
+    """
+    config = load_training_config(store_dir)
+    store_dir = store_dir or MODEL_STORE_DIR
+    file_path = os.path.join(SCRIPT_DIR, MOOD_CRAMP_DATASET)
+    key = model_artifact_key(file_path, config)
+    if compact:
+        try:
+            return load_flat_models(_flat_dir(key, store_dir))
+        except (OSError, ValueError):
+            pass
+    models = load_model_artifact(key, store_dir)
+    if models is None:
+        models = _fit_mood_cramp_models(file_path, config)
+        try:
+            save_model_artifact(key, models, store_dir)
+        except OSError as e:
+            print(f"Could not save model artifact: {e}")
+    if compact:
+        try:
+            _save_flat_artifact(key, models, store_dir)
+            return load_flat_models(_flat_dir(key, store_dir))
+        except OSError as e:
+            print(f"Could not save compact model artifact: {e}")
+    return models
+
+def show_model_error(error):
+    """Shows the error dialog for a failed model load. Must be called on the Tk thread."""
+    if isinstance(error, FileNotFoundError):
+        messagebox.showerror("Error", "Dataset_2.csv not found in the application folder. Forecasting will be disabled.")
+    else:
+        messagebox.showerror("Model Training Error", f"Could not train models. Error: {error}")
+
+def load_mood_cramp_models(store_dir=None, compact=False):
+    """
+    Returns the mood and cramp models, loading them from the artifact store when
+    the training data and configuration are unchanged, and training (then storing)
+    them otherwise. compact=True returns memory-mapped FlatForest models.
+    """
+    try:
+        return _load_mood_cramp_models(store_dir, compact)
     except Exception as e:
-        messagebox.showerror("Model Training Error", f"Could not train models. Error: {e}")
-        return None, None, None
\ No newline at end of file
+        show_model_error(e)
+        return None, None, None
+
+def load_mood_cramp_models_in_background(store_dir=None, compact=False):
+    """
+    Starts loading (or training) the mood and cramp models on a worker thread.
+    Returns a Future; poll `done()` from the Tk loop and call `result()` once it is set.
+    Errors are raised from `result()` so they can be reported on the Tk thread.
+    """
+    future = Future()
+
+    def worker():
+        try:
+            future.set_result(_load_mood_cramp_models(store_dir, compact))
+        except Exception as e:
+            future.set_exception(e)
+
+    # Daemon thread so closing the window never waits for a forest to finish fitting
+    threading.Thread(target=worker, name="model-loader", daemon=True).start()
+    return future
+
+# --- Batch Forecasting ---
+# Predictions for many (Age, BMI, Stress Level, Sleep Hours) rows in one vectorized
+# pass per model, instead of building a one-row DataFrame per prediction.
+
+def predict_mood_cramps(mood_model, cramp_model, label_encoders, X):
+    """
+    Predicts mood and cramp risk for every row of X, an (n, 4) array-like with columns
+    in MOOD_CRAMP_FEATURES order. Returns a dict of arrays:
+    'mood' (labels), 'mood_proba' (n, n_moods, columns in 'mood_classes' order),
+    'cramp_high' (bool) and 'cramp_proba' (probability of cramps).
+    """
+    X = np.asarray(X, dtype=np.float64).reshape(-1, len(MOOD_CRAMP_FEATURES))
+    mood_proba = mood_model.predict_proba(X)
+    cramp_proba = cramp_model.predict_proba(X)
+    # Same tie-breaking as RandomForestClassifier.predict: first class with the highest probability
+    mood_classes = label_encoders['mood'].inverse_transform(mood_model.classes_)
+    cramp_classes = cramp_model.classes_
+    cramp_column = np.flatnonzero(cramp_classes == 1)
+    return {
+        'mood': mood_classes[mood_proba.argmax(axis=1)],
+        'mood_proba': mood_proba,
+        'mood_classes': mood_classes,
+        'cramp_high': cramp_classes[cramp_proba.argmax(axis=1)] == 1,
+        'cramp_proba': cramp_proba[:, cramp_column[0]] if cramp_column.size else np.zeros(len(X)),
+    }
+
+def log_features(logs, age, bmi):
+    """Builds the (n, 4) feature array for stored logs (with stress_level and sleep_hours columns)."""
+    X = np.empty((len(logs), len(MOOD_CRAMP_FEATURES)))
+    X[:, 0], X[:, 1] = age, bmi
+    X[:, 2] = logs['stress_level'].to_numpy(dtype=np.float64)
+    X[:, 3] = logs['sleep_hours'].to_numpy(dtype=np.float64)
+    return X
+
+def predict_user_logs(mood_model, cramp_model, label_encoders, user_id, age, bmi, start_date=None, end_date=None):
+    """Predicts mood and cramp risk for each of a user's stored logs with numeric stress and sleep values."""
+    rows = snapshot_cache.get_snapshot(user_id).between(start_date, end_date) # Typed arrays; no SQLite read unless logs were saved
+    logs = pd.DataFrame({'date': rows['date'].astype('datetime64[ns]'), 'stress_level': rows['stress_level'], 'sleep_hours': rows['sleep_hours']}).dropna()
+    predictions = predict_mood_cramps(mood_model, cramp_model, label_encoders, log_features(logs, age, bmi))
+    return logs.assign(mood=predictions['mood'], cramp_high=predictions['cramp_high'], cramp_proba=predictions['cramp_proba'])
+
+def forecast_cohort(mood_model, cramp_model, label_encoders, lookback_days=14, as_of=None):
+    """
+    Next-week forecast for every user with a saved profile: each user's average stress and
+    sleep over the last `lookback_days` days, plus their age and BMI, predicted in one batch.
+    Returns a DataFrame with one row per user.
+    """
+    as_of = as_of or datetime.now().date()
+    cohort = db.get_cohort_recent_averages(as_of - timedelta(days=lookback_days - 1), as_of)
+    predictions = predict_mood_cramps(mood_model, cramp_model, label_encoders, cohort[['age', 'bmi', 'stress_level', 'sleep_hours']].to_numpy())
+    return pd.DataFrame({
+        'user_id': cohort['user_id'],
+        'week_start': (as_of + timedelta(days=1)).isoformat(),
+        'mood': predictions['mood'],
+        'mood_confidence': predictions['mood_proba'].max(axis=1) if len(cohort) else np.empty(0),
+        'cramp_high': predictions['cramp_high'].astype(int),
+        'cramp_probability': predictions['cramp_proba'],
+    })
+
+def run_nightly_forecast(lookback_days=14):
+    """Loads the models, forecasts the whole cohort and stores the results. Returns the number of users forecast."""
+    models = _load_mood_cramp_models()
+    forecasts = forecast_cohort(*models, lookback_days=lookback_days)
+    db.save_cohort_forecasts(forecasts)
+    return len(forecasts)
+
+# --- Cycle Forecasting ---
+# A normal-normal model of cycle length. The population prior (the spread of
+# people's mean cycle lengths, and of each person's cycles around their own mean)
+# comes from Dataset_4 and Dataset_3; each user's logged cycles then pull their
+# estimate away from the population mean as evidence accumulates. The posterior
+# only needs the running count, sum and sum of squares of a user's cycle
+# lengths, which database.record_period_start keeps up to date in O(1).
+
+# Dataset -> (cycle length, that person's mean cycle length, luteal phase length) columns
+CYCLE_DATASETS = {
+    'Dataset_4.csv': ('LengthofCycle', 'MeanCycleLength', 'LengthofLutealPhase'),
+    'Dataset_3.csv': ('Length_of_cycle', 'Mean_of_length_of_cycle', 'Length_of_Leutal_Phase'),
+}
+PRIOR_VARIANCE_WEIGHT = 4 # Pseudo-cycles of population variability mixed into a user's own variance
+CYCLE_INTERVAL_Z = 1.96 # ~95% intervals
+
+class CycleForecaster:
+    def __init__(self, mean_length, between_var, within_var, luteal_mean, luteal_var):
+        self.mean_length = mean_length
+        self.between_var = between_var # Variance of people's mean cycle lengths
+        self.within_var = within_var   # Variance of one person's cycles around their own mean
+        self.luteal_mean = luteal_mean
+        self.luteal_var = luteal_var
+
+    @classmethod
+    def fit(cls, cycle_lengths, person_means, luteal_lengths):
+        """Fits the population prior from per-cycle lengths, each cycle's person mean, and luteal phase lengths."""
+        cycle_lengths, person_means, luteal_lengths = (np.asarray(a, dtype=np.float64) for a in (cycle_lengths, person_means, luteal_lengths))
+        return cls(
+            mean_length=float(cycle_lengths.mean()),
+            between_var=float(person_means.var(ddof=1)),
+            within_var=float(np.mean((cycle_lengths - person_means) ** 2)),
+            luteal_mean=float(np.nanmean(luteal_lengths)),
+            luteal_var=float(np.nanvar(luteal_lengths, ddof=1)),
+        )
+
+    @classmethod
+    def from_datasets(cls, sources=CYCLE_DATASETS, data_dir=SCRIPT_DIR):
+        columns = [datasets.load(name, list(cols), data_dir).to_numpy(dtype=np.float64) for name, cols in sources.items()]
+        pooled = np.concatenate(columns)
+        pooled = pooled[~np.isnan(pooled[:, :2]).any(axis=1)]
+        return cls.fit(pooled[:, 0], pooled[:, 1], pooled[:, 2])
+
+    def cycle_length(self, n_cycles, length_sum, length_sq_sum):
+        """
+        Posterior mean and predictive variance of the next cycle length, given a user's
+        cycle count, sum and sum of squares. Accepts scalars or arrays (one entry per user).
+        """
+        n = np.asarray(n_cycles, dtype=np.float64)
+        total = np.asarray(length_sum, dtype=np.float64)
+        squares = np.asarray(length_sq_sum, dtype=np.float64)
+        # The user's own cycle-to-cycle variance, shrunk towards the population's
+        own_ss = np.where(n > 0, squares - total ** 2 / np.maximum(n, 1), 0.0)
+        within_var = (PRIOR_VARIANCE_WEIGHT * self.within_var + own_ss) / (PRIOR_VARIANCE_WEIGHT + np.maximum(n - 1, 0))
+        precision = 1 / self.between_var + n / within_var
+        mean = (self.mean_length / self.between_var + total / within_var) / precision
+        return mean, 1 / precision + within_var
+
+    def forecast(self, stats, last_start=None):
+        """
+        Next period and ovulation for one user's cycle stats (see database.get_cycle_stats;
+        None for a user with no history, which gives the population forecast). Returns a dict
+        with 'next_period' and 'ovulation' dates, their '*_sd' in days, 'cycle_length',
+        'luteal_length' and 'n_cycles'.
+        """
+        stats = stats or {'n_cycles': 0, 'length_sum': 0.0, 'length_sq_sum': 0.0, 'last_start': last_start}
+        last_start = last_start or stats['last_start']
+        mean, variance = self.cycle_length(stats['n_cycles'], stats['length_sum'], stats['length_sq_sum'])
+        cycle_length = float(mean)
+        next_period = last_start + timedelta(days=round(cycle_length))
+        return {
+            'cycle_length': cycle_length,
+            'luteal_length': self.luteal_mean,
+            'n_cycles': stats['n_cycles'],
+            'next_period': next_period,
+            'next_period_sd': float(np.sqrt(variance)),
+            'ovulation': next_period - timedelta(days=round(self.luteal_mean)),
+            'ovulation_sd': float(np.sqrt(variance + self.luteal_var)),
+        }
+
+_cycle_forecaster = None
+_cycle_forecaster_lock = threading.Lock()
+
+def get_cycle_forecaster():
+    """The shared forecaster, with its prior fitted from the bundled datasets on first use."""
+    global _cycle_forecaster
+    with _cycle_forecaster_lock:
+        if _cycle_forecaster is None:
+            _cycle_forecaster = CycleForecaster.from_datasets()
+        return _cycle_forecaster
+
+# --- Hormonal Risk Model ---
+# A calibrated logistic regression on Dataset_1 (outcome Y/N against age, BMI,
+# FSH, pregnancies, births and HRT). Fitted once and stored like the forests; the
+# stored model is compiled to a few NumPy arrays, and the feature pipeline keeps
+# the rows it has already transformed, so the Hormonal Health tab can rescore on
+# every keystroke in its details. Any input may be missing. The symptom checklist
+# is not a model input. Dataset_1 records its outcome only as Y/N, so estimates
+# are shown as the chance of that outcome, named by RISK_OUTCOME_LABEL.
+
+RISK_DATASET = 'Dataset_1.csv'
+RISK_INPUTS = ['Age', 'BMI', 'FSH', 'Pregnancies', 'Births', 'HRT']
+RISK_DATASET_COLUMNS = ['age1', 'bmi', 'FSH', 'G', 'P', 'HRT'] # In RISK_INPUTS order
+RISK_POSITIVE_OUTCOME = 'Y'
+RISK_OUTCOME_LABEL = "outcome 'Y' in the Dataset_1 reference cohort"
+HRT_YES, HRT_NO = 1, 2 # As coded in Dataset_1
+RISK_STORE_VERSION = 1
+RISK_CALIBRATION_FOLDS = 5
+
+class RiskFeaturePipeline:
+    """
+    Raw RISK_INPUTS rows (NaN for missing) -> model features: log FSH, an HRT indicator,
+    and training medians for missing values. Single rows are memoized.
+    """
+    CACHE_SIZE = 256
+
+    def __init__(self, medians):
+        self.medians = medians
+        self._cache = {}
+
+    @staticmethod
+    def engineer(raw):
+        raw = np.asarray(raw, dtype=np.float64).reshape(-1, len(RISK_INPUTS))
+        features = raw.copy()
+        fsh, hrt = RISK_INPUTS.index('FSH'), RISK_INPUTS.index('HRT')
+        features[:, fsh] = np.log(np.where(raw[:, fsh] > 0, raw[:, fsh], np.nan))
+        features[:, hrt] = np.where(np.isnan(raw[:, hrt]), np.nan, raw[:, hrt] == HRT_YES)
+        return features
+
+    @classmethod
+    def fit(cls, raw):
+        return cls(np.nanmedian(cls.engineer(raw), axis=0))
+
+    def transform(self, raw):
+        features = self.engineer(raw)
+        return np.where(np.isnan(features), self.medians, features)
+
+    def transform_one(self, values):
+        """Features for one row of raw inputs (None or NaN for missing), from the cache when seen before."""
+        key = tuple(np.nan if v is None else float(v) for v in values)
+        features = self._cache.get(key)
+        if features is None:
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.pop(next(iter(self._cache)))
+            features = self._cache[key] = self.transform([key])[0]
+        return features
+
+    def __getstate__(self):
+        return {'medians': self.medians, '_cache': {}}
+
+class RiskModel:
+    """
+    A fitted CalibratedClassifierCV(StandardScaler + LogisticRegression, method='sigmoid')
+    compiled to arrays: each calibration fold's scaled linear model and sigmoid calibration,
+    with the fold probabilities averaged as sklearn does.
+    """
+    def __init__(self, weights, intercepts, calibration_a, calibration_b):
+        self.weights, self.intercepts = weights, intercepts
+        self.calibration_a, self.calibration_b = calibration_a, calibration_b
+
+    @classmethod
+    def from_sklearn(cls, calibrated):
+        weights, intercepts, a, b = [], [], [], []
+        for fold in calibrated.calibrated_classifiers_:
+            scaler, logistic = fold.estimator.named_steps['standardscaler'], fold.estimator.named_steps['logisticregression']
+            # Fold the scaler into the linear model: w.(x - mean)/scale + c = (w/scale).x + (c - w.mean/scale)
+            w = logistic.coef_[0] / scaler.scale_
+            weights.append(w)
+            intercepts.append(logistic.intercept_[0] - w @ scaler.mean_)
+            a.append(fold.calibrators[0].a_)
+            b.append(fold.calibrators[0].b_)
+        return cls(np.array(weights), np.array(intercepts), np.array(a), np.array(b))
+
+    def predict_proba(self, X):
+        """Probability of the positive outcome for each row of model features."""
+        decision = np.asarray(X, dtype=np.float64).reshape(-1, self.weights.shape[1]) @ self.weights.T + self.intercepts
+        return (1 / (1 + np.exp(self.calibration_a * decision + self.calibration_b))).mean(axis=1)
+
+def risk_training_data(file_path):
+    """Reads Dataset_1 and returns (raw RISK_INPUTS array, 0/1 outcome array)."""
+    df = datasets.load_path(file_path, RISK_DATASET_COLUMNS + ['outcome'])
+    return df[RISK_DATASET_COLUMNS].to_numpy(dtype=np.float64), (df['outcome'] == RISK_POSITIVE_OUTCOME).to_numpy(dtype=int)
+
+def _calibrated_risk_classifier():
+    return CalibratedClassifierCV(make_pipeline(StandardScaler(), LogisticRegression()), method='sigmoid', cv=RISK_CALIBRATION_FOLDS)
+
+def train_risk_model(file_path):
+    """Fits the feature pipeline and calibrated model. Returns (pipeline, RiskModel, cross-validated metrics)."""
+    raw, y = risk_training_data(file_path)
+    pipeline = RiskFeaturePipeline.fit(raw)
+    X = pipeline.transform(raw)
+    held_out = cross_val_predict(_calibrated_risk_classifier(), X, y, method='predict_proba',
+                                 cv=StratifiedKFold(RISK_CALIBRATION_FOLDS, shuffle=True, random_state=42))[:, 1]
+    metrics = {
+        'auc': float(roc_auc_score(y, held_out)),
+        'brier': float(brier_score_loss(y, held_out)),
+        'base_rate_brier': float(brier_score_loss(y, np.full(len(y), y.mean()))),
+    }
+    return pipeline, RiskModel.from_sklearn(_calibrated_risk_classifier().fit(X, y)), metrics
+
+def _load_risk_model(store_dir=None):
+    """Store-first load of (pipeline, RiskModel, metrics). Raises on failure."""
+    store_dir = store_dir or MODEL_STORE_DIR
+    file_path = os.path.join(SCRIPT_DIR, RISK_DATASET)
+    key = _store_key(file_path, {'store_version': RISK_STORE_VERSION, 'inputs': RISK_INPUTS, 'folds': RISK_CALIBRATION_FOLDS})
+    path = os.path.join(store_dir, f"risk_{key}.pkl")
+    artifact = _read_artifact(path, key)
+    if artifact is None:
+        pipeline, model, metrics = train_risk_model(file_path)
+        artifact = {'key': key, 'inputs': RISK_INPUTS, 'pipeline': pipeline, 'model': model, 'metrics': metrics}
+        try:
+            _write_artifact(path, artifact, 'risk_')
+        except OSError as e:
+            print(f"Could not save risk model artifact: {e}")
+    return artifact['pipeline'], artifact['model'], artifact['metrics']
+
+_risk_model_future = None
+_risk_model_lock = threading.Lock()
+
+def preload_risk_model():
+    """
+    Starts loading (or training) the shared risk model on a worker thread, once per process.
+    Returns its Future; a failed load keeps its exception and is not retried.
+    """
+    global _risk_model_future
+    with _risk_model_lock:
+        if _risk_model_future is not None:
+            return _risk_model_future
+        future = _risk_model_future = Future()
+
+    def worker():
+        try:
+            future.set_result(_load_risk_model())
+        except Exception as e:
+            print(f"Could not load risk model: {e}")
+            future.set_exception(e)
+
+    threading.Thread(target=worker, name="risk-model-loader", daemon=True).start()
+    return future
+
+def get_risk_model(wait=False):
+    """
+    The shared (pipeline, RiskModel, metrics), or None if it failed to load or, unless
+    `wait`, is still loading. Never trains on the calling thread.
+    """
+    future = preload_risk_model()
+    if not wait and not future.done():
+        return None
+    try:
+        return future.result()
+    except Exception:
+        return None
+
+def predict_risk(values, wait=False):
+    """
+    Calibrated probability of RISK_OUTCOME_LABEL for one row of RISK_INPUTS values (None for
+    missing), or None without a model (see get_risk_model).
+    """
+    loaded = get_risk_model(wait)
+    if loaded is None:
+        return None
+    pipeline, model, _ = loaded
+    return float(model.predict_proba(pipeline.transform_one(values))[0])
+
+if __name__ == "__main__":
+    # Batch jobs, e.g. a nightly `python ml_models.py nightly-forecast` from cron / Task Scheduler
+    import sys
+    if sys.argv[1:] == ["nightly-forecast"]:
+        db.init_db()
+        print(f"Forecast {run_nightly_forecast()} users.")
+    else:
+        print("Usage: python ml_models.py nightly-forecast")
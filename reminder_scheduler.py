@@ -0,0 +1,196 @@
+"""
+Fires reminders while the app is running, not just at login.
+
+Upcoming reminders are read once (database.get_upcoming_reminders, a range scan
+on idx_reminders_user_date) into a heap ordered by due date, and a single
+root.after is armed for the earliest one. database.add_reminder and
+record_period_start notify the scheduler through database listeners, so nothing
+polls the database. A recurring reminder is pushed back with its next date when
+it fires.
+
+Recurrence (reminders.recurrence):
+    None           once, on reminder_date
+    'days:N'       every N days from reminder_date
+    'cycle_day:N'  day N of every cycle from reminder_date on, counted from the
+                   user's last logged period start and the predicted next period
+                   (the app's own prediction for that start when it has made one,
+                   see use_prediction; otherwise the cycle forecaster's)
+"""
+import heapq
+import itertools
+from datetime import date, datetime, timedelta
+
+import database as db
+
+MAX_WAIT_MS = 60 * 60 * 1000 # Longest single root.after; re-arming keeps far-off reminders honest across sleep and clock changes
+RECURRENCE_KINDS = ('days', 'cycle_day')
+
+def parse_recurrence(recurrence):
+    """Splits 'kind:N' into (kind, N). Raises ValueError for anything else."""
+    kind, _, n = recurrence.partition(':')
+    if kind not in RECURRENCE_KINDS or not n.isdigit() or int(n) < 1:
+        raise ValueError(f"Unknown reminder recurrence: {recurrence!r}")
+    return kind, int(n)
+
+def next_occurrence(reminder_date, recurrence, on_or_after, cycle=None):
+    """
+    The first date on or after `on_or_after` that a reminder is due, or None if it never is
+    (again). `cycle` is (last_start, next_period, cycle_length) and is needed for cycle_day
+    reminders; without logged periods they have no date yet.
+    """
+    if recurrence is None:
+        return reminder_date if reminder_date >= on_or_after else None
+    on_or_after = max(on_or_after, reminder_date)
+    kind, n = parse_recurrence(recurrence)
+    if kind == 'days':
+        return reminder_date + timedelta(days=-(-(on_or_after - reminder_date).days // n) * n)
+    if cycle is None:
+        return None
+    last_start, next_period, cycle_length = cycle
+    if last_start + timedelta(days=n - 1) >= on_or_after:
+        return last_start + timedelta(days=n - 1)
+    # From the predicted next period on, whole predicted cycles (the prediction may already be overdue)
+    due = next_period + timedelta(days=n - 1)
+    if due < on_or_after:
+        due += timedelta(days=-(-(on_or_after - due).days // cycle_length) * cycle_length)
+    return due
+
+class ReminderScheduler:
+    """
+    Calls `on_due(messages)` on the Tk thread as `user_id`'s reminders come due (at the start
+    of their day), and `on_change()` whenever what due_today() returns may have changed.
+    """
+
+    def __init__(self, root, user_id, on_due, on_change=None):
+        self.root = root
+        self.user_id = user_id
+        self.on_due = on_due
+        self.on_change = on_change
+        self._fired = [] # (day fired, message) for reminders that have already come due
+        self._heap = [] # (due date, tie-breaker, reminder dict)
+        self._order = itertools.count()
+        self._after_id = None
+        self._cycle = None # (last_start, next_period, cycle_length), read on first use by a cycle_day reminder
+        self._cycle_read = False
+        self._cycle_reminders = [] # cycle_day reminders, rescheduled when a new period start is logged
+        self._prediction = None # (last_start, cycle_length) from use_prediction
+
+    def start(self):
+        db.add_listener('reminder', self._on_reminder_added)
+        db.add_listener('period_start', self._on_period_start)
+        self.reload()
+
+    def stop(self):
+        db.remove_listener('reminder', self._on_reminder_added)
+        db.remove_listener('period_start', self._on_period_start)
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def reload(self):
+        """Rebuilds the heap from the database. Reminders due today fire straight away."""
+        today = date.today()
+        self._heap, self._cycle_read, self._cycle_reminders = [], False, []
+        for reminder in db.get_upcoming_reminders(self.user_id, today):
+            self._push(reminder, today)
+        self._arm()
+        self._changed()
+
+    def pending(self):
+        """(due date, message) for every scheduled reminder, soonest first."""
+        return [(due, reminder['message']) for due, _, reminder in sorted(self._heap)]
+
+    def due_today(self):
+        """Messages of every reminder due today, recurring ones included: those already fired, then those still pending."""
+        today = date.today()
+        return [message for day, message in self._fired if day == today] + [message for due, message in self.pending() if due == today]
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def use_prediction(self, last_start, cycle_length):
+        """Schedules cycle_day reminders from a prediction the app has already made, rather than running the forecaster again."""
+        self._prediction = (last_start, cycle_length)
+        self._reschedule_cycle_reminders()
+
+    def _cycle_info(self):
+        if not self._cycle_read:
+            self._cycle_read = True
+            self._cycle = None
+            stats = db.get_cycle_stats(self.user_id)
+            if stats is not None and self._prediction is not None and self._prediction[0] == stats['last_start']:
+                last_start, cycle_length = self._prediction
+                self._cycle = (last_start, last_start + timedelta(days=cycle_length), max(1, cycle_length))
+            elif stats is not None:
+                try:
+                    import ml_models
+                    forecast = ml_models.get_cycle_forecaster().forecast(stats)
+                except Exception as e:
+                    # E.g. a missing Dataset_3/4: cycle_day reminders wait for a prediction or the next period start
+                    print(f"Could not forecast the cycle for reminders: {e}")
+                    return None
+                self._cycle = (stats['last_start'], forecast['next_period'], max(1, round(forecast['cycle_length'])))
+        return self._cycle
+
+    def _push(self, reminder, on_or_after):
+        recurrence = reminder['recurrence']
+        is_cycle_day = bool(recurrence) and recurrence.startswith('cycle_day:')
+        if is_cycle_day and all(r is not reminder for r in self._cycle_reminders):
+            self._cycle_reminders.append(reminder)
+        try:
+            cycle = self._cycle_info() if is_cycle_day else None
+            due = next_occurrence(date.fromisoformat(reminder['reminder_date']), recurrence, on_or_after, cycle)
+        except Exception as e:
+            print(f"Skipping reminder {reminder['message']!r}: {e}")
+            return
+        if due is not None:
+            heapq.heappush(self._heap, (due, next(self._order), reminder))
+
+    def _arm(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._heap:
+            wait = datetime.combine(self._heap[0][0], datetime.min.time()) - datetime.now()
+            self._after_id = self.root.after(min(MAX_WAIT_MS, max(0, int(wait.total_seconds() * 1000))), self._fire)
+
+    def _fire(self):
+        self._after_id = None
+        today = date.today()
+        due = []
+        self._fired = [(day, message) for day, message in self._fired if day == today]
+        while self._heap and self._heap[0][0] <= today:
+            day, _, reminder = heapq.heappop(self._heap)
+            due.append(reminder['message'])
+            self._fired.append((today, reminder['message']))
+            reminder['fired_on'] = day # So a rescheduled cycle_day reminder doesn't repeat that day
+            if reminder['recurrence']:
+                self._push(reminder, day + timedelta(days=1))
+        self._arm()
+        if due:
+            self._changed()
+            self.on_due(due)
+
+    def _on_reminder_added(self, user_id, reminder_date, message, recurrence):
+        if user_id == self.user_id:
+            self._push({'reminder_date': reminder_date, 'message': message, 'recurrence': recurrence}, date.today())
+            self._arm()
+            self._changed()
+
+    def _on_period_start(self, user_id, start_date):
+        if user_id == self.user_id:
+            self._reschedule_cycle_reminders()
+
+    def _reschedule_cycle_reminders(self):
+        # Cycle-day reminders move with a new start or prediction
+        cycle_reminders = {id(r) for r in self._cycle_reminders}
+        self._heap = [entry for entry in self._heap if id(entry[2]) not in cycle_reminders]
+        heapq.heapify(self._heap)
+        self._cycle_read = False
+        today = date.today()
+        for reminder in self._cycle_reminders:
+            fired_on = reminder.get('fired_on')
+            self._push(reminder, max(today, fired_on + timedelta(days=1)) if fired_on else today)
+        self._arm()
+        self._changed()
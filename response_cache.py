@@ -0,0 +1,133 @@
+"""
+Persistent cache of AI companion replies, so repeated questions skip the model round trip.
+
+Entries are keyed on the normalized question. A miss on the exact key falls back
+to near-duplicate matching (character trigram Jaccard similarity), so "Why do I
+get cramps?" and "why do i get cramps" share one reply. A near-duplicate must have
+the same numbers and negations as the question: "35 day cycle" never answers "45
+day cycle", nor "should I take ibuprofen" "should I not take ibuprofen". Entries expire
+after `ttl` seconds and the least recently used ones are evicted beyond `max_entries`.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DATABASE = os.path.join(SCRIPT_DIR, 'luna_cache.db')
+
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MIN_SIMILARITY = 0.8 # Trigram Jaccard needed for a near-duplicate hit; None disables it
+
+def normalize_query(text):
+    """Lowercases, drops punctuation and collapses whitespace."""
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text.lower())).strip()
+
+# Tokens that flip a question's meaning; "don't" etc. normalize to "don t"
+NEGATIONS = frozenset({'no', 'not', 'never', 'nor', 'none', 'nothing', 'without', 'cannot', 't',
+                       'dont', 'doesnt', 'didnt', 'isnt', 'arent', 'cant', 'wont', 'shouldnt'})
+
+def meaning_tokens(normalized):
+    """The numbers (in order) and negation words of a normalized question, which a near-duplicate must share."""
+    words = normalized.split()
+    return tuple(w for w in words if w.isdigit()), tuple(sorted(w for w in words if w in NEGATIONS))
+
+def trigrams(normalized):
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+class ResponseCache:
+    def __init__(self, path=CACHE_DATABASE, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, min_similarity=DEFAULT_MIN_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self.counters = {'hits': 0, 'near_hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        # Used from the chat worker thread as well as the Tk thread, always under _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used_at)")
+        # Trigram sets of every cached key, for near-duplicate matching without touching disk
+        self._trigrams = {key: trigrams(key) for (key,) in self._conn.execute("SELECT key FROM responses")}
+
+    def _nearest_key(self, key):
+        grams, meaning = trigrams(key), meaning_tokens(key)
+        best_key, best_similarity = None, 0.0
+        for other, other_grams in self._trigrams.items():
+            similarity = len(grams & other_grams) / len(grams | other_grams)
+            if similarity > best_similarity and meaning_tokens(other) == meaning:
+                best_key, best_similarity = other, similarity
+        return best_key if best_similarity >= self.min_similarity else None
+
+    def get(self, query):
+        """Returns the cached reply for `query` (or a near-duplicate of it), or None."""
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            counter = 'hits'
+            if key not in self._trigrams and self.min_similarity is not None:
+                key, counter = self._nearest_key(key), 'near_hits'
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone() if key else None
+            if row is None:
+                self.counters['misses'] += 1
+                return None
+            response, created_at = row
+            with self._conn:
+                if now - created_at > self.ttl:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._trigrams.pop(key, None)
+                    self.counters['expired'] += 1
+                    self.counters['misses'] += 1
+                    return None
+                self._conn.execute("UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self.counters[counter] += 1
+            return response
+
+    def put(self, query, response):
+        """Stores a reply, evicting the least recently used entries beyond max_entries."""
+        key = normalize_query(query)
+        if not key or not response:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute('''
+                INSERT INTO responses (key, response, created_at, last_used_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET response = excluded.response, created_at = excluded.created_at, last_used_at = excluded.last_used_at
+            ''', (key, response, now, now))
+            self._trigrams[key] = trigrams(key)
+            excess = len(self._trigrams) - self.max_entries
+            if excess > 0:
+                evicted = self._conn.execute("SELECT key FROM responses ORDER BY last_used_at LIMIT ?", (excess,)).fetchall()
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+                for (old_key,) in evicted:
+                    self._trigrams.pop(old_key, None)
+                self.counters['evictions'] += len(evicted)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._trigrams.clear()
+
+    def stats(self):
+        """Hit/miss counters since the cache was opened, plus current size and hit rate."""
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._trigrams))
+        lookups = stats['hits'] + stats['near_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['near_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,297 @@
+"""
+Columnar per-user snapshots of the logs, for charts and forecasting over history.
+
+Each user's dates, mood, sleep, stress and cramps are kept as typed NumPy arrays in
+date order (.npy files under snapshot_store/, opened as memory maps), so readers get
+already-converted, zero-copy views instead of re-reading and re-parsing SQLite rows.
+Arrays are allocated with spare capacity: new logs are appended in place, and only a
+backfilled log (dated before the snapshot's last date) or an edited or deleted log
+forces a rebuild. Edits and deletes are caught from any client: every read compares
+the snapshot with the per-user counter database triggers keep in log_versions.
+database.add_log and import_logs notify the cache of new logs, so a read only goes
+back to SQLite for rows when there is something new to fetch (logs inserted by another
+client while the app runs are picked up on the next save or start).
+
+Mapped snapshots count against a memory budget; the least recently used users'
+maps are dropped past it (their files stay on disk for the next read).
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import database as db
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(SCRIPT_DIR, 'snapshot_store')
+SNAPSHOT_MEMORY_BUDGET = 64 * 2**20 # Bytes of mapped arrays kept across users
+SNAPSHOT_MIN_CAPACITY = 1024        # Rows allocated for a new snapshot; grows by doubling
+SNAPSHOT_VERSION = 1
+
+# Column -> dtype. Non-numeric sleep/stress/cramp entries are NaN (as in query_logs);
+# mood is an index into the snapshot's 'moods' vocabulary, -1 when blank.
+SNAPSHOT_COLUMNS = {
+    'date': 'datetime64[D]',
+    'mood': 'int16',
+    'sleep_hours': 'float64',
+    'stress_level': 'float64',
+    'cramp_intensity': 'float64',
+}
+NO_MOOD = -1
+
+class Snapshot:
+    """One user's mapped arrays and metadata. Read through columns() or between(); don't write to the views."""
+
+    def __init__(self, directory, meta, arrays):
+        self.directory = directory
+        self.meta = meta
+        self.arrays = arrays # Column -> memmap of the full capacity
+
+    @property
+    def rows(self):
+        return self.meta['rows']
+
+    @property
+    def moods(self):
+        """The mood vocabulary: mood code i is moods[i]."""
+        return self.meta['moods']
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def columns(self, start=0, stop=None):
+        """Read-only views of rows start:stop (default: all) for every column."""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        views = {}
+        for column, array in self.arrays.items():
+            view = array[start:stop]
+            view.flags.writeable = False
+            views[column] = view
+        return views
+
+    def between(self, start_date=None, end_date=None):
+        """Views of the rows dated start_date..end_date (inclusive, either optional)."""
+        dates = self.arrays['date'][:self.rows]
+        start = 0 if start_date is None else int(np.searchsorted(dates, np.datetime64(start_date, 'D'), side='left'))
+        stop = self.rows if end_date is None else int(np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right'))
+        return self.columns(start, stop)
+
+    def mood_values(self, codes, mapping, default=np.nan):
+        """Maps mood codes (e.g. between()['mood']) through `mapping` (mood -> number) to a float array."""
+        lookup = np.array([mapping.get(mood, default) for mood in self.moods] + [default], dtype=float)
+        return lookup[codes] # NO_MOOD (-1) picks the trailing default
+
+def _column_path(directory, column, generation):
+    return os.path.join(directory, f"{column}.{generation}.npy")
+
+def _write_meta(directory, meta):
+    tmp = os.path.join(directory, "meta.json.tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(directory, "meta.json"))
+
+def _open(directory, meta):
+    return Snapshot(directory, meta, {column: np.load(_column_path(directory, column, meta['generation']), mmap_mode='r+')
+                                      for column in SNAPSHOT_COLUMNS})
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json"), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _load(directory):
+    """The snapshot stored in `directory`, or None if there isn't a usable one."""
+    meta = _read_meta(directory)
+    if meta is None or meta.get('version') != SNAPSHOT_VERSION or meta.get('invalid'):
+        return None
+    try:
+        return _open(directory, meta)
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _write_generation(directory, columns, meta):
+    """
+    Writes `columns` (row arrays) as a new generation of files with spare capacity and
+    points meta.json at it. Older generations are deleted when nothing has them mapped.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rows = len(columns['date'])
+    capacity = max(SNAPSHOT_MIN_CAPACITY, 2 * rows)
+    meta = dict(meta, version=SNAPSHOT_VERSION, rows=rows, generation=meta.get('generation', 0) + 1)
+    for column, dtype in SNAPSHOT_COLUMNS.items():
+        array = np.lib.format.open_memmap(_column_path(directory, column, meta['generation']), mode='w+', dtype=dtype, shape=(capacity,))
+        array[:rows] = columns[column]
+        array.flush()
+        del array
+    _write_meta(directory, meta)
+    current = {os.path.basename(_column_path(directory, column, meta['generation'])) for column in SNAPSHOT_COLUMNS}
+    for name in os.listdir(directory):
+        if name.endswith('.npy') and name not in current:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass # Still mapped by a reader (Windows); removed on a later write
+    return _open(directory, meta)
+
+def _typed_columns(logs, moods):
+    """query_logs rows -> snapshot column arrays, adding unseen moods to `moods` (in place). Rows without a valid date are dropped."""
+    dates = logs['date'].to_numpy().astype('datetime64[D]')
+    valid = ~np.isnat(dates)
+    codes = {mood: i for i, mood in enumerate(moods)}
+    mood_codes = np.empty(len(logs), dtype=np.int16)
+    for i, mood in enumerate(logs['mood'].to_numpy()):
+        if mood is None or mood != mood or not str(mood).strip(): # None, NaN or blank
+            mood_codes[i] = NO_MOOD
+            continue
+        if mood not in codes:
+            codes[mood] = len(moods)
+            moods.append(mood)
+        mood_codes[i] = codes[mood]
+    columns = {'date': dates, 'mood': mood_codes}
+    for column in ('sleep_hours', 'stress_level', 'cramp_intensity'):
+        columns[column] = logs[column].to_numpy(dtype=np.float64)
+    return {column: values[valid] for column, values in columns.items()}
+
+def _fetch(user_id, after_id=None):
+    logs = db.query_logs(user_id, ['id'] + list(SNAPSHOT_COLUMNS), after_id=after_id)
+    return logs, (int(logs['id'].max()) if len(logs) else after_id)
+
+def build_snapshot(directory, user_id):
+    """Reads all of a user's logs from SQLite into a fresh snapshot."""
+    log_version = db.get_log_version(user_id) # Read first: an edit during the fetch then forces another rebuild
+    logs, last_id = _fetch(user_id)
+    moods = []
+    meta = {'user_id': user_id, 'moods': moods, 'last_id': last_id or 0, 'source_rows': len(logs), 'log_version': log_version}
+    previous = _read_meta(directory)
+    if previous is not None and isinstance(previous.get('generation'), int):
+        meta['generation'] = previous['generation'] # Continue numbering: the old files may still be mapped
+    return _write_generation(directory, _typed_columns(logs, moods), meta)
+
+def catch_up(snapshot, user_id):
+    """Appends logs saved since the snapshot was written. Returns the (possibly rebuilt) snapshot."""
+    logs, last_id = _fetch(user_id, snapshot.meta['last_id'])
+    if not len(logs):
+        return snapshot
+    meta = dict(snapshot.meta, moods=list(snapshot.moods))
+    new = _typed_columns(logs, meta['moods'])
+    rows, added = snapshot.rows, len(new['date'])
+    if rows and added and new['date'][0] < snapshot.arrays['date'][rows - 1]:
+        return build_snapshot(snapshot.directory, user_id) # A backfilled day: rows would be out of date order
+    meta.update(last_id=last_id, source_rows=meta['source_rows'] + len(logs), rows=rows + added)
+    if rows + added > len(snapshot.arrays['date']):
+        old = snapshot.columns()
+        return _write_generation(snapshot.directory, {c: np.concatenate([old[c], new[c]]) for c in SNAPSHOT_COLUMNS}, meta)
+    for column, array in snapshot.arrays.items():
+        array[rows:rows + added] = new[column]
+        array.flush()
+    _write_meta(snapshot.directory, meta) # Rows past meta['rows'] are ignored, so the arrays are written first
+    snapshot.meta = meta
+    return snapshot
+
+class SnapshotCache:
+    """Per-user snapshots with LRU eviction of their maps past `budget_bytes`."""
+
+    def __init__(self, budget_bytes=SNAPSHOT_MEMORY_BUDGET, directory=SNAPSHOT_DIR):
+        self.budget_bytes = budget_bytes
+        self.directory = directory
+        self._snapshots = OrderedDict() # (database, user_id) -> Snapshot, least recently used first
+        self._fresh = set()             # Keys with nothing saved since their last catch-up
+        self._lock = threading.RLock()
+        self.counters = {'hits': 0, 'loads': 0, 'builds': 0, 'appends': 0, 'evictions': 0}
+        db.add_listener('log', self._on_log)
+
+    def _key(self, user_id):
+        return os.path.abspath(db.DATABASE_NAME), user_id
+
+    def _user_directory(self, key):
+        database, user_id = key
+        return os.path.join(self.directory, hashlib.sha256(database.encode('utf-8')).hexdigest()[:16], f"user_{user_id}")
+
+    def get(self, user_id):
+        """The user's snapshot, up to date with every log saved so far."""
+        key = self._key(user_id)
+        with self._lock:
+            snapshot = self._snapshots.pop(key, None)
+            if snapshot is not None and snapshot.meta.get('log_version') != db.get_log_version(user_id):
+                self._fresh.discard(key) # A log was edited or deleted, possibly by another client
+                self.counters['builds'] += 1
+                snapshot = build_snapshot(self._user_directory(key), user_id)
+            if snapshot is not None and key in self._fresh:
+                self.counters['hits'] += 1
+            else:
+                snapshot = self._refresh(key, snapshot)
+                self._fresh.add(key)
+            self._snapshots[key] = snapshot
+            self._evict(keep=key)
+            return snapshot
+
+    def _refresh(self, key, snapshot):
+        user_id = key[1]
+        if snapshot is None:
+            snapshot = _load(self._user_directory(key))
+            # The file may predate edits made while the app was closed, or another database
+            # at the same path: it must still cover exactly the logs up to its last id, with
+            # none of them edited or deleted since
+            if snapshot is not None and (snapshot.meta.get('log_version') != db.get_log_version(user_id)
+                                         or db.count_logs(user_id, snapshot.meta['last_id']) != snapshot.meta['source_rows']):
+                snapshot = None
+            if snapshot is None:
+                self.counters['builds'] += 1
+                return build_snapshot(self._user_directory(key), user_id)
+            self.counters['loads'] += 1
+        generation, rows = snapshot.meta['generation'], snapshot.rows
+        snapshot = catch_up(snapshot, user_id)
+        if snapshot.meta['generation'] != generation:
+            self.counters['builds'] += 1
+        elif snapshot.rows != rows:
+            self.counters['appends'] += 1
+        return snapshot
+
+    def _evict(self, keep):
+        total = sum(snapshot.nbytes for snapshot in self._snapshots.values())
+        for key in list(self._snapshots):
+            if total <= self.budget_bytes:
+                break
+            if key != keep:
+                total -= self._snapshots.pop(key).nbytes
+                self._fresh.discard(key)
+                self.counters['evictions'] += 1
+
+    def invalidate(self, user_id):
+        """Forgets a user's snapshot, in memory and on disk; the next get() rebuilds it."""
+        key = self._key(user_id)
+        with self._lock:
+            self._snapshots.pop(key, None)
+            self._fresh.discard(key)
+            directory = self._user_directory(key)
+            meta = _read_meta(directory)
+            if meta is not None:
+                _write_meta(directory, dict(meta, invalid=True))
+
+    def _on_log(self, user_id):
+        with self._lock:
+            self._fresh.discard(self._key(user_id))
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, users=len(self._snapshots), bytes=sum(s.nbytes for s in self._snapshots.values()))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_snapshot_cache():
+    """The shared cache, created (and subscribed to log saves) on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SnapshotCache()
+        return _cache
+
+def get_snapshot(user_id):
+    return get_snapshot_cache().get(user_id)
@@ -0,0 +1,121 @@
+"""
+Hyperparameter search and cross-validation for the mood/cramp forests.
+
+Every (model, hyperparameters) candidate is cross-validated in a process pool,
+folds grouped by user so no user's cycles appear on both sides of a split. The
+report shows accuracy against fit and predict time, and the smallest forest
+within `tolerance` of the best accuracy is picked for each model. With --apply
+the picks are written to ml_models.TRAINING_CONFIG_PATH (training_config.json,
+committed with the code), which the app's model store keys on, so the next load
+retrains with them.
+
+Usage: python training_pipeline.py [--folds 5] [--tolerance 0.01] [--workers N] [--apply]
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GroupKFold
+
+import ml_models
+
+PARAM_GRID = {
+    'n_estimators': [10, 25, 50, 100, 200],
+    'max_depth': [None, 6, 12],
+    'min_samples_leaf': [1, 5],
+}
+
+def candidates(grid=PARAM_GRID):
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield dict(zip(keys, values), random_state=ml_models.MOOD_CRAMP_PARAMS['random_state'])
+
+def size_rank(params):
+    """Orders candidates from smallest to largest forest (fewest trees, then shallowest, then coarsest leaves)."""
+    depth = params['max_depth'] if params['max_depth'] is not None else float('inf')
+    return (params['n_estimators'], depth, -params['min_samples_leaf'])
+
+def cross_validate(target, params, X, y, groups, folds):
+    """Runs one candidate through k-fold CV. Executed in a worker process."""
+    scores, fit_times, predict_times = [], [], []
+    for train, test in GroupKFold(n_splits=folds).split(X, y, groups):
+        # One thread per fit: the process pool already uses every core
+        model = RandomForestClassifier(**params, n_jobs=1)
+        start = time.perf_counter()
+        model.fit(X[train], y[train])
+        fit_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        predicted = model.predict(X[test])
+        predict_times.append((time.perf_counter() - start) / len(test))
+        scores.append(float(np.mean(predicted == y[test])))
+    return {
+        'target': target,
+        'params': params,
+        'accuracy': float(np.mean(scores)),
+        'accuracy_std': float(np.std(scores)),
+        'fit_s': float(np.mean(fit_times)),
+        'predict_us_per_row': float(np.mean(predict_times) * 1e6),
+    }
+
+def run_search(folds=5, workers=None, grid=PARAM_GRID):
+    """Cross-validates every candidate for both models in a process pool. Returns the result dicts."""
+    file_path = os.path.join(ml_models.SCRIPT_DIR, ml_models.MOOD_CRAMP_DATASET)
+    X, y_mood, y_cramps, _, groups = ml_models.mood_cramp_training_data(file_path)
+    jobs = [(target, params) for target in ('mood', 'cramp') for params in candidates(grid)]
+    targets = {'mood': y_mood, 'cramp': y_cramps}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(cross_validate, target, params, X, targets[target], groups, folds) for target, params in jobs]
+        return [future.result() for future in futures]
+
+def pick_configs(results, tolerance=0.01):
+    """For each model, the smallest candidate whose CV accuracy is within `tolerance` of the best."""
+    picks = {}
+    for target in ('mood', 'cramp'):
+        rows = [r for r in results if r['target'] == target]
+        best = max(r['accuracy'] for r in rows)
+        eligible = [r for r in rows if r['accuracy'] >= best - tolerance]
+        picks[target] = min(eligible, key=lambda r: size_rank(r['params']))
+    return picks
+
+def format_report(results, picks):
+    lines = []
+    for target in ('mood', 'cramp'):
+        lines.append(f"== {target} model ==")
+        lines.append(f"{'trees':>6}{'depth':>7}{'leaf':>6}{'accuracy':>12}{'fit (s)':>10}{'predict (us/row)':>18}")
+        for r in sorted((r for r in results if r['target'] == target), key=lambda r: size_rank(r['params'])):
+            p = r['params']
+            marker = "  <- picked" if r is picks[target] else ""
+            lines.append(f"{p['n_estimators']:>6}{str(p['max_depth']):>7}{p['min_samples_leaf']:>6}"
+                         f"{r['accuracy']:>7.3f}±{r['accuracy_std']:.3f}{r['fit_s']:>10.3f}{r['predict_us_per_row']:>18.1f}{marker}")
+        lines.append("")
+    return "\n".join(lines)
+
+def apply_configs(picks, store_dir=None):
+    """Writes the picked hyperparameters where ml_models' artifact store (or the one in `store_dir`) reads them."""
+    path = ml_models.training_config_path(store_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({target: r['params'] for target, r in picks.items()}, f, indent=2)
+        f.write("\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search for the mood/cramp forests.")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--tolerance', type=float, default=0.01, help="accuracy allowed below the best when picking a smaller forest")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--apply', action='store_true', help="save the picks for the app's model loading")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_search(args.folds, args.workers)
+    picks = pick_configs(results, args.tolerance)
+    print(format_report(results, picks))
+    print(f"{len(results)} candidates x {args.folds} folds in {time.perf_counter() - start:.1f} s")
+    if args.apply:
+        apply_configs(picks)
+        print(f"Saved picks to {ml_models.TRAINING_CONFIG_PATH}; models retrain on next load.")
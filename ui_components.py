@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 from tkcalendar import DateEntry
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import math
 import matplotlib.pyplot as plt
@@ -11,6 +12,9 @@ import random # Needed for mindfulness moments
 
 import database as db
 import ai_companion
+import knowledge_base
+import ml_models
+from snapshot_cache import get_snapshot
 
 # --- Meditation Content ---
 GUIDED_MEDITATIONS = {
@@ -60,13 +64,14 @@ def create_dashboard_tab(app, frame):
     reminders_frame = ttk.Frame(frame, style='TFrame', padding=10); reminders_frame.pack(pady=10, padx=20, fill='x')
     ttk.Label(reminders_frame, text="Today's Reminders ✨", font=('Helvetica', 12, 'bold')).pack()
     app.dashboard_reminders = ttk.Label(reminders_frame, text="No reminders for today.", justify='center'); app.dashboard_reminders.pack()
-    update_dashboard(app)
+    update_dashboard(app, *getattr(app, 'cycle_prediction', ()))
 
-def update_dashboard(app, last_date=None, cycle_length=28):
+def update_dashboard(app, last_date=None, cycle_length=28, luteal_length=14):
+    if not hasattr(app, 'cycle_canvas'): return # Dashboard tab not built yet; it draws the latest prediction when it is
     app.cycle_canvas.delete("all"); app.cycle_canvas.create_oval(50, 50, 250, 250, outline=app.colors['primary'], width=10)
     if last_date:
         today = datetime.now().date(); current_cycle_day = (today - last_date).days + 1; current_cycle_day = max(1, current_cycle_day)
-        next_period_date = last_date + timedelta(days=cycle_length); ovulation_day = next_period_date - timedelta(days=14); fertile_start = ovulation_day - timedelta(days=5)
+        next_period_date = last_date + timedelta(days=cycle_length); ovulation_day = next_period_date - timedelta(days=luteal_length); fertile_start = ovulation_day - timedelta(days=5)
         app.dashboard_cycle_day.config(text=f"Cycle Day: {current_cycle_day}"); app.dashboard_next_period.config(text=f"Predicted Next Period: {next_period_date.strftime('%b %d, %Y')}")
         period_start_angle = (360 / cycle_length) * (cycle_length - 1)
         app.cycle_canvas.create_arc(50, 50, 250, 250, start=period_start_angle, extent=(360/cycle_length)*5, style=tk.ARC, outline=app.colors['secondary'], width=10)
@@ -78,30 +83,55 @@ def update_dashboard(app, last_date=None, cycle_length=28):
         app.cycle_canvas.create_oval(x-5, y-5, x+5, y+5, fill=app.colors['fg'], outline=app.colors['fg'])
     else:
         app.cycle_canvas.create_text(150, 150, text="Go to 'Period Prediction' tab\nto see your cycle wheel.", justify='center', font=('Helvetica', 10))
-    today_str = datetime.now().strftime('%Y-%m-%d'); reminders = db.get_reminders_for_date(app.user_id, today_str)
+    update_dashboard_reminders(app)
+
+def update_dashboard_reminders(app):
+    # From the reminder scheduler, so repeating and cycle-day reminders due today show too; it calls this when they change
+    if not hasattr(app, 'dashboard_reminders'): return # Dashboard tab not built yet
+    scheduler = getattr(app, 'reminder_scheduler', None); reminders = scheduler.due_today() if scheduler else []
     app.dashboard_reminders.config(text="\n".join(f"• {r}" for r in reminders) if reminders else "No reminders for today.")
 
 def create_period_prediction_tab(app, frame):
     inner_frame = ttk.Frame(frame); inner_frame.pack(expand=True)
     ttk.Label(inner_frame, text="Last Period Date:").grid(row=0, column=0, padx=10, pady=10)
     app.last_period_date = DateEntry(inner_frame, width=12, background=app.colors['accent'], foreground='white', borderwidth=2); app.last_period_date.grid(row=0, column=1, padx=10, pady=10)
-    ttk.Label(inner_frame, text="Average Cycle Length:").grid(row=1, column=0, padx=10, pady=10)
+    ttk.Label(inner_frame, text="Cycle Length (optional):").grid(row=1, column=0, padx=10, pady=10)
     app.avg_cycle_length = ttk.Entry(inner_frame); app.avg_cycle_length.grid(row=1, column=1, padx=10, pady=10)
-    ttk.Button(inner_frame, text="🩸 Predict", command=lambda: predict_period(app)).grid(row=2, column=0, columnspan=2, pady=20)
+    ttk.Button(inner_frame, text="🩸 Predict", command=lambda: predict_period(app)).grid(row=2, column=0, padx=10, pady=20)
+    ttk.Button(inner_frame, text="📅 Log Period Start", command=lambda: predict_period(app, log_start=True)).grid(row=2, column=1, padx=10, pady=20)
     app.prediction_result = ttk.Label(inner_frame, text="", style='Result.TLabel'); app.prediction_result.grid(row=3, column=0, columnspan=2, pady=10)
     app.fertility_result = ttk.Label(inner_frame, text="", style='Result.TLabel', foreground=app.colors['secondary'], justify='center'); app.fertility_result.grid(row=4, column=0, columnspan=2, pady=5)
 
-def predict_period(app):
+def predict_period(app, log_start=False):
+    """Predicts from the user's cycle history (first logging the period start if `log_start`); a typed cycle length overrides the model."""
+    last_date, typed_length = app.last_period_date.get_date(), app.avg_cycle_length.get().strip()
+    low, high = db.CYCLE_LENGTH_RANGE
+    try:
+        cycle_length = int(typed_length) if typed_length else None
+        if cycle_length is not None and not low <= cycle_length <= high: raise ValueError(typed_length)
+    except ValueError: messagebox.showerror("Input Error", f"Please enter a cycle length between {low} and {high} days, or leave it blank to use your logged cycles."); return
     try:
-        last_date, cycle_length = app.last_period_date.get_date(), int(app.avg_cycle_length.get())
-        next_period_date = last_date + timedelta(days=cycle_length)
-        app.prediction_result.config(text=f"Predicted Next Period Date: {next_period_date.strftime('%Y-%m-%d')}")
-        ovulation_day = next_period_date - timedelta(days=14)
-        fertile_window_start = ovulation_day - timedelta(days=5)
-        app.fertility_result.config(text=f"Estimated Ovulation: {ovulation_day.strftime('%Y-%m-%d')}\nFertile Window: {fertile_window_start.strftime('%b %d')} - {ovulation_day.strftime('%b %d')}")
-        update_dashboard(app, last_date, cycle_length)
-    except ValueError:
-        messagebox.showerror("Input Error", "Please enter a valid number for cycle length.")
+        stats = db.record_period_start(app.user_id, last_date) if log_start else db.get_cycle_stats(app.user_id)
+        forecast = ml_models.get_cycle_forecaster().forecast(stats, last_date)
+    except Exception as e: messagebox.showerror("Error", f"Could not predict your cycle: {e}"); return
+    luteal_length = round(forecast['luteal_length'])
+    if cycle_length is not None:
+        next_period_date, ovulation_day = last_date + timedelta(days=cycle_length), last_date + timedelta(days=cycle_length - luteal_length)
+        period_note, ovulation_note = f" (model: {forecast['next_period'].strftime('%Y-%m-%d')})", ""
+    else:
+        next_period_date, ovulation_day, cycle_length = forecast['next_period'], forecast['ovulation'], round(forecast['cycle_length'])
+        period_note, ovulation_note = f" ± {ml_models.CYCLE_INTERVAL_Z * forecast['next_period_sd']:.0f} days", f" ± {ml_models.CYCLE_INTERVAL_Z * forecast['ovulation_sd']:.0f} days"
+    fertile_window_start = ovulation_day - timedelta(days=5)
+    history_note = f"Based on {forecast['n_cycles']} logged cycle{'s' if forecast['n_cycles'] != 1 else ''}" if forecast['n_cycles'] else "Based on typical cycles; log more period starts to personalize"
+    app.prediction_result.config(text=f"Predicted Next Period Date: {next_period_date.strftime('%Y-%m-%d')}{period_note}")
+    app.fertility_result.config(text=f"Estimated Ovulation: {ovulation_day.strftime('%Y-%m-%d')}{ovulation_note}\nFertile Window: {fertile_window_start.strftime('%b %d')} - {ovulation_day.strftime('%b %d')}\n{history_note}")
+    app.cycle_prediction = (last_date, cycle_length, luteal_length)
+    app.reminder_scheduler.use_prediction(last_date, cycle_length) # Cycle-day reminders follow what the user was shown
+    update_dashboard(app, *app.cycle_prediction)
+
+# Tabs are built lazily (see MenstrualHealthTracker.ensure_tab), so code shared
+# between tabs must not assume another tab's widgets exist yet.
+MOOD_VALUES = ["😊 Happy", "🙂 Content", "😁 Joyful", "😂 Laughing", "😢 Sad", "😭 Crying", "😞 Disappointed", "😥 Gloomy", "😠 Angry", "😤 Frustrated", "😡 Annoyed", "😴 Tired", "😪 Sleepy", "😫 Exhausted", "😰 Anxious", "😨 Scared", "😱 Worried", "😐 Neutral", "😑 Calm", "😌 Relaxed", "😍 Energetic", "🤩 Motivated", "🥳 Excited"]
 
 def create_daily_logging_tab(app, frame):
     main_frame = ttk.Frame(frame); main_frame.pack(fill="both", expand=True); main_frame.grid_columnconfigure(1, weight=1)
@@ -109,8 +139,7 @@ def create_daily_logging_tab(app, frame):
     app.log_entries = {}
     for i, label_text in enumerate(labels): ttk.Label(main_frame, text=label_text).grid(row=i, column=0, padx=20, pady=7, sticky='nw')
     app.log_entries["Breakfast"], app.log_entries["Lunch"], app.log_entries["Dinner"] = ttk.Entry(main_frame), ttk.Entry(main_frame), ttk.Entry(main_frame)
-    mood_values = ["😊 Happy", "🙂 Content", "😁 Joyful", "😂 Laughing", "😢 Sad", "😭 Crying", "😞 Disappointed", "😥 Gloomy", "😠 Angry", "😤 Frustrated", "😡 Annoyed", "😴 Tired", "😪 Sleepy", "😫 Exhausted", "😰 Anxious", "😨 Scared", "😱 Worried", "😐 Neutral", "😑 Calm", "😌 Relaxed", "😍 Energetic", "🤩 Motivated", "🥳 Excited"]
-    app.log_entries["Mood"] = ttk.Combobox(main_frame, values=mood_values)
+    app.log_entries["Mood"] = ttk.Combobox(main_frame, values=MOOD_VALUES)
     app.log_entries["Sleep Hours"] = ttk.Entry(main_frame)
     app.log_entries["Stress Level"], app.log_entries["Cramp Intensity"] = ttk.Scale(main_frame, from_=1, to=10, orient='horizontal'), ttk.Scale(main_frame, from_=1, to=10, orient='horizontal')
     app.log_entries["Physical Activity"] = ttk.Combobox(main_frame, values=["Low", "Moderate", "High"])
@@ -150,10 +179,21 @@ def create_forecasting_tab(app, frame):
             scale = ttk.Scale(inner_frame, from_=1, to=max_val, orient='horizontal', command=lambda v, l=value_label: l.config(text=f"{float(v):.0f}")); scale.grid(row=i, column=1, sticky='ew', padx=5)
             app.forecast_entries[key] = scale
     inner_frame.grid_columnconfigure(1, weight=1)
-    ttk.Button(inner_frame, text="🔮 Forecast Mood & Cramps", command=lambda: forecast_mood_cramps(app)).grid(row=len(labels)+1, column=0, columnspan=3, pady=20)
-    app.forecast_result = ttk.Label(inner_frame, text="", style='Result.TLabel', justify='center'); app.forecast_result.grid(row=len(labels)+2, column=0, columnspan=3, pady=10)
+    app.saved_profile = db.get_user_profile(app.user_id)
+    app.cohort_opt_in = tk.BooleanVar(value=app.saved_profile is not None); app.cohort_opt_in.trace_add('write', lambda *_: on_cohort_opt_in_changed(app))
+    ttk.Checkbutton(inner_frame, text="Include me in cohort forecasts (saves my age and BMI)", variable=app.cohort_opt_in).grid(row=len(labels)+1, column=0, columnspan=3, pady=(10,0))
+    ttk.Button(inner_frame, text="🔮 Forecast Mood & Cramps", command=lambda: forecast_mood_cramps(app)).grid(row=len(labels)+2, column=0, columnspan=3, pady=20)
+    app.forecast_result = ttk.Label(inner_frame, text="", style='Result.TLabel', justify='center'); app.forecast_result.grid(row=len(labels)+3, column=0, columnspan=3, pady=10)
+
+def on_cohort_opt_in_changed(app):
+    # Opting out removes the saved profile straight away; opting in saves it with the next forecast
+    if not app.cohort_opt_in.get() and app.saved_profile is not None:
+        db.delete_user_profile(app.user_id); app.saved_profile = None
+
+MODELS_WARMING_UP_TEXT = "⏳ Models are warming up...\nYour forecast will be ready in a moment."
 
 def forecast_mood_cramps(app):
+    if not app.models_ready: app.forecast_result.config(text=MODELS_WARMING_UP_TEXT); return
     if not app.mood_model or not app.cramp_model: messagebox.showerror("Error", "Models not trained."); return
     age_str, weight_str, height_str = app.forecast_entries['Age'].get(), app.forecast_entries['Weight'].get(), app.forecast_entries['Height'].get()
     if not all([age_str, weight_str, height_str]): messagebox.showerror("Input Error", "Fill in Age, Weight, Height."); return
@@ -162,13 +202,20 @@ def forecast_mood_cramps(app):
         stress, sleep = float(app.forecast_entries['Stress'].get()), float(app.forecast_entries['Sleep'].get())
         if height_cm == 0: messagebox.showerror("Error", "Height cannot be zero."); return
         bmi = weight_kg / ((height_cm / 100) ** 2)
-        data = {'Age': [age], 'BMI': [bmi], 'Stress Level': [stress], 'Sleep Hours': [sleep]}; df = pd.DataFrame(data)
-        mood_pred_encoded, cramp_pred = app.mood_model.predict(df), app.cramp_model.predict(df)
-        mood_pred = app.label_encoders['mood'].inverse_transform(mood_pred_encoded)
-        cramp_risk = "High" if cramp_pred[0] == 1 else "Low"
-        app.forecast_result.config(text=f"Forecast: {mood_pred[0]}, Cramp Risk: {cramp_risk}\n(BMI: {bmi:.1f})")
+        prediction = ml_models.predict_mood_cramps(app.mood_model, app.cramp_model, app.label_encoders, [[age, bmi, stress, sleep]])
+        cramp_risk = "High" if prediction['cramp_high'][0] else "Low"
+        app.forecast_result.config(text=f"Forecast: {prediction['mood'][0]}, Cramp Risk: {cramp_risk}\n(BMI: {bmi:.1f})")
+        if app.cohort_opt_in.get() and app.saved_profile != (age, bmi):
+            db.save_user_profile(app.user_id, age, bmi); app.saved_profile = (age, bmi) # Lets the nightly cohort forecast include this user
     except ValueError: messagebox.showerror("Input Error", "Age, Weight, Height must be numbers.")
 
+def on_models_ready(app):
+    # Called on the Tk thread once the background model load finishes; re-run a forecast that was waiting on it
+    if not hasattr(app, 'forecast_result'): return # Forecasting tab not built yet
+    if app.forecast_result.cget('text') == MODELS_WARMING_UP_TEXT:
+        app.forecast_result.config(text="")
+        if app.mood_model and app.cramp_model: forecast_mood_cramps(app)
+
 def create_reminders_tab(app, frame):
     inner_frame = ttk.Frame(frame); inner_frame.pack(expand=True, padx=20, pady=20)
     ttk.Label(inner_frame, text="Set a New Reminder", font=("Helvetica", 14, 'bold')).grid(row=0, column=0, columnspan=2, pady=(0,15))
@@ -176,17 +223,28 @@ def create_reminders_tab(app, frame):
     app.reminder_date = DateEntry(inner_frame, width=15, background=app.colors['accent'], foreground='white', borderwidth=2); app.reminder_date.grid(row=1, column=1, sticky='w', pady=5)
     ttk.Label(inner_frame, text="Message:").grid(row=2, column=0, sticky='w', pady=5)
     app.reminder_message = ttk.Entry(inner_frame, width=40); app.reminder_message.grid(row=2, column=1, pady=5)
-    ttk.Button(inner_frame, text="⏰ Set Reminder", command=lambda: save_reminder(app)).grid(row=3, column=0, columnspan=2, pady=20)
+    ttk.Label(inner_frame, text="Repeat:").grid(row=3, column=0, sticky='w', pady=5)
+    repeat_frame = ttk.Frame(inner_frame); repeat_frame.grid(row=3, column=1, sticky='w', pady=5)
+    app.reminder_repeat = ttk.Combobox(repeat_frame, values=list(REMINDER_REPEATS), state='readonly', width=22); app.reminder_repeat.current(0); app.reminder_repeat.pack(side='left')
+    ttk.Label(repeat_frame, text="  Cycle day:").pack(side='left')
+    app.reminder_cycle_day = ttk.Spinbox(repeat_frame, from_=1, to=40, width=4); app.reminder_cycle_day.set(1); app.reminder_cycle_day.pack(side='left')
+    ttk.Button(inner_frame, text="⏰ Set Reminder", command=lambda: save_reminder(app)).grid(row=4, column=0, columnspan=2, pady=20)
+
+# Repeat choices -> reminders.recurrence (see reminder_scheduler); {day} is the Cycle day box
+REMINDER_REPEATS = {"Does not repeat": None, "Every week": "days:7", "Every cycle, on cycle day": "cycle_day:{day}"}
 
 def save_reminder(app):
     date, message = app.reminder_date.get_date().strftime('%Y-%m-%d'), app.reminder_message.get()
     if not message: messagebox.showerror("Error", "Enter reminder message."); return
-    db.add_reminder(app.user_id, date, message)
-    messagebox.showinfo("Success", f"Reminder set for {date}!")
-    app.reminder_message.delete(0, tk.END)
-    last_date_obj = app.last_period_date.get_date() if hasattr(app, 'last_period_date') and app.last_period_date.get() else None
-    cycle_length_str = app.avg_cycle_length.get() if hasattr(app, 'avg_cycle_length') else '28'
-    update_dashboard(app, last_date_obj, int(cycle_length_str or '28'))
+    repeat = app.reminder_repeat.get(); recurrence = REMINDER_REPEATS[repeat]
+    if recurrence and '{day}' in recurrence:
+        try: day = int(app.reminder_cycle_day.get())
+        except ValueError: day = 0
+        if day < 1: messagebox.showerror("Error", "Enter a cycle day of 1 or more."); return
+        recurrence = recurrence.format(day=day); repeat = f"{repeat} {day}"
+    db.add_reminder(app.user_id, date, message, recurrence)
+    messagebox.showinfo("Success", f"Reminder set for {date}!" if not recurrence else f"Reminder set from {date}, repeating {repeat.lower()}!")
+    app.reminder_message.delete(0, tk.END) # The scheduler hears about the new reminder and refreshes the dashboard
 
 def create_meditate_tab(app, frame):
     notebook = ttk.Notebook(frame); notebook.pack(pady=10, padx=10, expand=True, fill='both')
@@ -251,27 +309,71 @@ def show_guided_meditation(app, key):
 def show_mindfulness_moment(app):
     app.moment_label.config(text=random.choice(MINDFULNESS_MOMENTS))
 
+HORMONAL_SYMPTOMS = [("Irregular or Missed Periods", "pcos"), ("Heavy Menstrual Bleeding", "pcos"), ("Excessive Hair Growth", "pcos"), ("Acne or Oily Skin", "pcos"), ("Weight Gain / Difficulty Losing Weight", "pcos_thyroid"), ("Hair Loss or Thinning", "pcos_thyroid"), ("Fatigue or Low Energy", "thyroid"), ("Anxiety or Depression", "pcos_thyroid"), ("Sensitivity to Cold or Heat", "thyroid")]
+HRT_CHOICES = {"": None, "Yes": ml_models.HRT_YES, "No": ml_models.HRT_NO}
+
 def create_symptom_checker_tab(app, frame):
     app.symptom_vars = {}
-    symptoms = [("Irregular or Missed Periods", "pcos"), ("Heavy Menstrual Bleeding", "pcos"), ("Excessive Hair Growth", "pcos"), ("Acne or Oily Skin", "pcos"), ("Weight Gain / Difficulty Losing Weight", "pcos_thyroid"), ("Hair Loss or Thinning", "pcos_thyroid"), ("Fatigue or Low Energy", "thyroid"), ("Anxiety or Depression", "pcos_thyroid"), ("Sensitivity to Cold or Heat", "thyroid")]
     ttk.Label(frame, text="Check any symptoms you are experiencing:", font=("Helvetica", 12)).pack(pady=15, padx=20, anchor='w')
     symptom_frame = ttk.Frame(frame); symptom_frame.pack(fill='x', padx=20)
-    for i, (symptom, category) in enumerate(symptoms):
-        app.symptom_vars[symptom] = tk.BooleanVar()
+    for i, (symptom, category) in enumerate(HORMONAL_SYMPTOMS):
+        app.symptom_vars[symptom] = tk.BooleanVar(); app.symptom_vars[symptom].trace_add('write', lambda *_: update_risk_estimate(app))
         cb = ttk.Checkbutton(symptom_frame, text=symptom, variable=app.symptom_vars[symptom], style='TCheckbutton'); cb.grid(row=i, column=0, sticky='w', pady=4)
+    # Optional details for the risk model (the checklist above is not one of its inputs); rescored live as they change
+    details_frame = ttk.Frame(frame); details_frame.pack(fill='x', padx=20, pady=(10, 0))
+    ttk.Label(details_frame, text="Optional details:").grid(row=0, column=0, columnspan=6, sticky='w')
+    app.risk_vars = {name: tk.StringVar() for name in ml_models.RISK_INPUTS}
+    for i, name in enumerate(ml_models.RISK_INPUTS):
+        ttk.Label(details_frame, text=f"{name}:").grid(row=1 + i // 3, column=2 * (i % 3), sticky='w', padx=(0, 5), pady=3)
+        widget = ttk.Combobox(details_frame, textvariable=app.risk_vars[name], values=list(HRT_CHOICES), state='readonly', width=8) if name == 'HRT' else ttk.Entry(details_frame, textvariable=app.risk_vars[name], width=10)
+        widget.grid(row=1 + i // 3, column=2 * (i % 3) + 1, sticky='w', padx=(0, 15), pady=3)
+        app.risk_vars[name].trace_add('write', lambda *_: update_risk_estimate(app))
+    app.risk_result = ttk.Label(frame, text="", justify='left'); app.risk_result.pack(padx=20, pady=(10, 0), anchor='w')
+    app.risk_model_future = ml_models.preload_risk_model(); poll_risk_model(app)
     ttk.Button(frame, text="Analyze Symptoms & Get Advice", command=lambda: analyze_symptoms(app)).pack(pady=20)
     app.advice_text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, height=10, state='disabled', bg='white', fg=app.colors['fg'], font=('Helvetica', 10)); app.advice_text.pack(pady=10, padx=20, fill='both', expand=True)
 
+def symptom_scores(app):
+    """The rule-based checklist: (selected symptoms, PCOS score, thyroid score)."""
+    selected = [symptom for symptom, var in app.symptom_vars.items() if var.get()]
+    categories = dict(HORMONAL_SYMPTOMS)
+    return selected, sum("pcos" in categories[s] for s in selected), sum("thyroid" in categories[s] for s in selected)
+
+def risk_inputs(app):
+    """The optional details as RISK_INPUTS values, None where blank or not a number."""
+    values = []
+    for name in ml_models.RISK_INPUTS:
+        text = app.risk_vars[name].get().strip()
+        if name == 'HRT': values.append(HRT_CHOICES.get(text)); continue
+        try: values.append(float(text))
+        except ValueError: values.append(None)
+    return values
+
+def risk_estimate_text(app):
+    """The checklist scores, plus the model's calibrated estimate from the details once any is filled in and the model has loaded."""
+    _, pcos_score, thyroid_score = symptom_scores(app)
+    pcos_max, thyroid_max = sum("pcos" in c for _, c in HORMONAL_SYMPTOMS), sum("thyroid" in c for _, c in HORMONAL_SYMPTOMS)
+    text = f"Checklist score: PCOS {pcos_score}/{pcos_max}, Thyroid {thyroid_score}/{thyroid_max}"
+    values = risk_inputs(app)
+    if not any(v is not None for v in values): return text
+    if not app.risk_model_future.done(): return "Model estimate: ⏳ loading...\n" + text
+    probability = ml_models.predict_risk(values)
+    if probability is None: return text
+    return f"Model estimate from your details (not the checklist): {probability:.0%} chance of {ml_models.RISK_OUTCOME_LABEL}\n" + text
+
+def update_risk_estimate(app):
+    app.risk_result.config(text=risk_estimate_text(app))
+
+def poll_risk_model(app):
+    # The risk model loads on a worker thread; score the details already typed once it arrives
+    if not app.risk_model_future.done(): app.root.after(app.MODEL_POLL_MS, lambda: poll_risk_model(app)); return
+    update_risk_estimate(app)
+
 def analyze_symptoms(app):
-    selected_symptoms = [symptom for symptom, var in app.symptom_vars.items() if var.get()]
+    selected_symptoms, pcos_score, thyroid_score = symptom_scores(app)
     if not selected_symptoms: messagebox.showinfo("No Symptoms", "Select symptoms first."); return
-    pcos_score, thyroid_score = 0, 0
-    symptom_map = dict([("Irregular or Missed Periods", "pcos"), ("Heavy Menstrual Bleeding", "pcos"), ("Excessive Hair Growth", "pcos"), ("Acne or Oily Skin", "pcos"), ("Weight Gain / Difficulty Losing Weight", "pcos_thyroid"), ("Hair Loss or Thinning", "pcos_thyroid"), ("Fatigue or Low Energy", "thyroid"), ("Anxiety or Depression", "pcos_thyroid"), ("Sensitivity to Cold or Heat", "thyroid")])
-    advice = "--- Personalized Advice ---\n\n"; summary = "--- Summary ---\n"
+    advice = "--- Personalized Advice ---\n\n"; summary = "--- Summary ---\n" + risk_estimate_text(app) + "\n\n"
     for symptom in selected_symptoms:
-        category = symptom_map.get(symptom, ""); 
-        if "pcos" in category: pcos_score += 1
-        if "thyroid" in category: thyroid_score += 1
         # Add advice snippets...
         if symptom == "Weight Gain / Difficulty Losing Weight": advice += "👉 For Weight Management: Focus on a low-glycemic diet and reduce processed sugars. Regular exercise is also key.\n\n"
         if symptom == "Acne or Oily Skin": advice += "👉 For Skin Health: Consider reducing dairy and high-sugar foods. Ensure you're getting enough zinc.\n\n"
@@ -292,24 +394,68 @@ def create_graphs_tab(app, frame):
     app.graph_canvas = canvas
     ttk.Button(frame, text="📊 Show/Refresh Graph", command=lambda: plot_graphs(app)).pack(pady=10)
 
+# --- Graphs ---
+# The plotted lines are kept between refreshes: a refresh appends only the snapshot
+# rows added since the last one and updates the lines' data in place. When the
+# snapshot was rebuilt in between (a backfilled day, an import, a change made
+# outside the app) its rows may have moved, so the series is re-read in full. Long histories are drawn
+# min/max-decimated to about one point per horizontal pixel, so years of daily logs
+# stay as cheap to draw as a few months.
+
+MOOD_INDEX = {mood.split(" ")[1]: i for i, mood in enumerate(MOOD_VALUES)} # Stored mood name -> y position
+GRAPH_MARKERS = ('o', 'x') # Mood, cramp intensity
+
+def minmax_decimate(x, y, buckets):
+    """Indices of the lowest and highest y in each of `buckets` equal-width x buckets (x sorted); every index when there are few points. NaN ys are dropped."""
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= 2 * buckets: return valid
+    xv, yv = x[valid], y[valid]
+    bucket = np.minimum(((xv - xv[0]) / ((xv[-1] - xv[0]) or 1.0) * buckets).astype(np.int64), buckets - 1)
+    order = np.lexsort((yv, bucket)); sorted_buckets = bucket[order]
+    first = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]]); last = np.r_[first[1:] - 1, len(order) - 1]
+    return valid[np.unique(np.concatenate([order[first], order[last]]))]
+
+def graph_series(app, start=0):
+    """(date numbers, mood positions, cramp intensities) for the user's log snapshot rows from `start` on. Records the snapshot version plotted in app.graph_version."""
+    snapshot = get_snapshot(app.user_id); rows = snapshot.columns(start)
+    app.graph_version = (snapshot.meta['generation'], snapshot.rows)
+    return mdates.date2num(rows['date']), snapshot.mood_values(rows['mood'], MOOD_INDEX), rows['cramp_intensity']
+
+def redraw_graph(app):
+    x, series = app.graph_series[0], app.graph_series[1:]
+    buckets = max(int(app.ax.bbox.width) // 2, 1) # Two points per bucket, so about one per pixel
+    for line, y, marker in zip(app.graph_lines, series, GRAPH_MARKERS):
+        keep = minmax_decimate(x, y, buckets); line.set_data(x[keep], y[keep])
+        line.set_marker(marker if len(keep) <= buckets // 2 else 'None') # Markers only while points are visibly apart
+    app.ax.relim(); app.ax.autoscale_view(); app.graph_canvas.draw_idle()
+
+def start_graph(app):
+    app.graph_series = graph_series(app)
+    if len(app.graph_series[0]) < 2: messagebox.showerror("Error", "Not enough log data."); return
+    app.ax.clear(); app.ax.xaxis_date()
+    app.graph_lines = (app.ax.plot([], [], marker=GRAPH_MARKERS[0], linestyle='-', label='Mood', color=app.colors['accent'])[0],
+                       app.ax.plot([], [], marker=GRAPH_MARKERS[1], linestyle='--', label='Cramp Intensity', color=app.colors['secondary'])[0])
+    app.ax.set_title('Mood & Cramp Intensity'); app.ax.set_xlabel('Date'); app.ax.set_ylabel('Level / Intensity')
+    app.ax.legend()
+    locator = mdates.AutoDateLocator(); formatter = mdates.ConciseDateFormatter(locator)
+    app.ax.xaxis.set_major_locator(locator); app.ax.xaxis.set_major_formatter(formatter)
+    app.fig.tight_layout()
+    app.fig.canvas.mpl_connect('resize_event', lambda event: redraw_graph(app)) # Re-bucket for the new width
+    redraw_graph(app)
+
+def extend_graph(app):
+    """Appends the snapshot rows added since the last refresh, or re-reads every row if the snapshot has been rebuilt since."""
+    generation, rows = app.graph_version; snapshot = get_snapshot(app.user_id)
+    if snapshot.meta['generation'] == generation and snapshot.rows >= rows:
+        new = graph_series(app, start=rows)
+        app.graph_series = tuple(np.concatenate([old, added]) for old, added in zip(app.graph_series, new))
+    else: app.graph_series = graph_series(app)
+    redraw_graph(app)
+
 def plot_graphs(app):
-    df = db.get_logs(app.user_id)
-    if df.empty or len(df) < 2: messagebox.showerror("Error", "Not enough log data."); return
     try:
-        df['date'] = pd.to_datetime(df['date']); df = df.sort_values('date') 
-        app.ax.clear()
-        mood_values = getattr(app, 'log_entries', {}).get('Mood', {}).get('values', [])
-        if not mood_values: messagebox.showerror("Error", "Mood list not available."); return
-        mood_map = {mood.split(" ")[1]: i for i, mood in enumerate(mood_values)}
-        df['mood_num'] = df['mood'].map(mood_map)
-        app.ax.plot(df['date'], df['mood_num'], marker='o', linestyle='-', label='Mood', color=app.colors['accent'])
-        df['cramp_intensity'] = pd.to_numeric(df['cramp_intensity'])
-        app.ax.plot(df['date'], df['cramp_intensity'], marker='x', linestyle='--', label='Cramp Intensity', color=app.colors['secondary'])
-        app.ax.set_title('Mood & Cramp Intensity'); app.ax.set_xlabel('Date'); app.ax.set_ylabel('Level / Intensity')
-        app.ax.legend()
-        locator = mdates.AutoDateLocator(); formatter = mdates.ConciseDateFormatter(locator)
-        app.ax.xaxis.set_major_locator(locator); app.ax.xaxis.set_major_formatter(formatter)
-        app.fig.tight_layout(); app.graph_canvas.draw()
+        if getattr(app, 'graph_lines', None) is None: start_graph(app)
+        else: extend_graph(app)
     except Exception as e: messagebox.showerror("Graph Error", f"Error: {e}")
 
 def create_weekly_summary_tab(app, frame):
@@ -318,19 +464,16 @@ def create_weekly_summary_tab(app, frame):
     ttk.Button(inner_frame, text="📅 Generate Weekly Summary", command=lambda: generate_summary(app)).pack(pady=10)
 
 def generate_summary(app):
-    df = db.get_logs(app.user_id)
-    if df.empty: messagebox.showerror("Error", "No log data."); return
     try:
-        df['date'] = pd.to_datetime(df['date']); df_last_week = df[df['date'] >= datetime.now() - timedelta(days=7)]
-        if df_last_week.empty or len(df_last_week) < 2: app.summary_text.delete('1.0', tk.END); app.summary_text.insert(tk.INSERT, "Not enough data."); return
+        week_start = (datetime.now() - timedelta(days=6)).date() # Today plus the 6 days before it
+        stats = db.get_log_summary(app.user_id, week_start) # Reads the daily rollups, not raw logs
+        if stats['log_count'] < 2: app.summary_text.delete('1.0', tk.END); app.summary_text.insert(tk.INSERT, "Not enough data."); return
         summary = "🌸 Weekly Summary 🌸\n\n"
-        summary += f"😴 Avg Sleep: {pd.to_numeric(df_last_week['sleep_hours']).mean():.2f} hrs\n"
-        summary += f"🧘 Avg Stress: {pd.to_numeric(df_last_week['stress_level']).mean():.2f}/10\n"
-        summary += f"💢 Avg Cramps: {pd.to_numeric(df_last_week['cramp_intensity']).mean():.2f}/10\n\n"
-        summary += "😊 Mood Trends:\n" + str(df_last_week['mood'].value_counts()) + "\n\n"
-        df_last_week['custom_tags'] = df_last_week['custom_tags'].fillna('')
-        all_tags = [tag.strip() for tags in df_last_week['custom_tags'] for tag in tags.split(',') if tag.strip()]
-        if all_tags: summary += "🏷️ Your Tags:\n" + str(pd.Series(all_tags).value_counts()) + "\n\n"
+        summary += f"😴 Avg Sleep: {stats['avg_sleep']:.2f} hrs\n"
+        summary += f"🧘 Avg Stress: {stats['avg_stress']:.2f}/10\n"
+        summary += f"💢 Avg Cramps: {stats['avg_cramps']:.2f}/10\n\n"
+        summary += "😊 Mood Trends:\n" + str(pd.Series(stats['mood_counts'], name='count', dtype='int64').rename_axis('mood')) + "\n\n"
+        if stats['tag_counts']: summary += "🏷️ Your Tags:\n" + str(pd.Series(stats['tag_counts'], name='count')) + "\n\n"
         summary += "✨ Personalized Insight ✨\n"
         insight = "" # (insight logic)
         summary += insight if insight else "You're doing a great job logging!"
@@ -413,15 +556,40 @@ def create_chatbot_tab(app, frame):
     app.chat_input.bind("<Return>", lambda event: get_chatbot_response(app))
     app.send_button = ttk.Button(input_frame, text="💬 Send", command=lambda: get_chatbot_response(app)); app.send_button.pack(side='right', padx=5)
     display_message(app, "🤖 Luna: Hi there! I'm Luna, your personal AI health companion. 🌸 How are you feeling today?")
+    knowledge_base.preload()
+
+CHAT_POLL_MS = 30 # How often the Tk loop collects streamed chunks
+CHAT_TIMEOUT_S = 60
 
 def get_chatbot_response(app):
     user_input = app.chat_input.get();
     if not user_input.strip(): return
+    if getattr(app, 'chat_stream', None) and not app.chat_stream.finished: return # One reply at a time
     display_message(app, "You: " + user_input)
-    app.chat_input.delete(0, tk.END); app.send_button.config(state="disabled"); app.root.update_idletasks()
-    response = ai_companion.get_ai_response(user_input)
-    display_message(app, "🤖 Luna: " + response)
-    app.send_button.config(state="normal")
+    app.chat_input.delete(0, tk.END)
+    answer = knowledge_base.lookup(user_input) # Instant offline reply for well-known questions
+    if answer: display_message(app, "🤖 Luna: " + answer); return
+    append_chat_text(app, "🤖 Luna: "); app.chat_reply_text = ""
+    # Stream on a worker thread so the window stays responsive; chunks are painted as they arrive
+    app.chat_stream = ai_companion.ChatStream(user_input, timeout=CHAT_TIMEOUT_S).start()
+    app.send_button.config(text="⏹ Stop", command=lambda: cancel_chatbot_response(app))
+    app.root.after(CHAT_POLL_MS, lambda: poll_chatbot_response(app))
+
+def poll_chatbot_response(app):
+    stream = app.chat_stream
+    for text in stream.poll(): append_chat_text(app, text); app.chat_reply_text += text
+    if not stream.finished: app.root.after(CHAT_POLL_MS, lambda: poll_chatbot_response(app)); return
+    if not app.chat_reply_text: append_chat_text(app, ai_companion.FALLBACK_RESPONSE)
+    elif stream.status == 'cancelled': append_chat_text(app, " (stopped)")
+    elif stream.status == 'timeout': append_chat_text(app, " … (timed out)")
+    append_chat_text(app, "\n\n")
+    app.send_button.config(text="💬 Send", command=lambda: get_chatbot_response(app))
+
+def cancel_chatbot_response(app):
+    app.chat_stream.cancel()
+
+def append_chat_text(app, text):
+    app.chat_history.config(state='normal'); app.chat_history.insert(tk.END, text); app.chat_history.config(state='disabled'); app.chat_history.yview(tk.END)
 
 def display_message(app, message):
     app.chat_history.config(state='normal'); app.chat_history.insert(tk.END, message + "\n\n"); app.chat_history.config(state='disabled'); app.chat_history.yview(tk.END)
\ No newline at end of file